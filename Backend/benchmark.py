@@ -0,0 +1,345 @@
+# benchmark.py
+"""
+Reproducible performance numbers for the prescription pipeline.
+
+    python benchmark.py micro
+    python benchmark.py e2e --workers 1 2 --images 1 3 5 10 --verify --stub-latency-ms 800
+    python benchmark.py compare bench_results/old.json bench_results/new.json
+
+micro     decode / preprocess, model forward one-by-one vs batched,
+          get_recommendation, the weather-risk rules (scalar vs vectorized)
+          and a 500-orchard × 2-week forecast risk plan
+e2e       starts a local Pl@ntNet stub (fixed latency ± jitter) and the app
+          per worker count, then drives /getPrescription with synthetic leaf
+          photos from --concurrency closed-loop clients
+compare   p50/p95/p99 and throughput deltas between two saved runs
+
+Every run is written to bench_results/<kind>-<timestamp>.json (see --out)
+with the git commit, machine and settings, so runs can be compared later.
+Photos are unique per request and the result/verdict caches are off
+unless --cache is given, so every request does the full work.
+"""
+import argparse, asyncio, io, json, os, platform, random, socket, subprocess
+import sys, tempfile, threading, time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# --------------------------------------------------------------------- #
+# helpers                                                               #
+# --------------------------------------------------------------------- #
+def percentiles(samples_s: List[float]) -> Dict[str, float]:
+    ms = np.asarray(samples_s) * 1000
+    if ms.size == 0:
+        return {"n": 0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"n": int(ms.size), "mean_ms": round(float(ms.mean()), 3),
+            "p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3)}
+
+def time_calls(fn: Callable[[], Any], repeat: int, warmup: int = 2) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return percentiles(samples)
+
+def synthetic_leaf(rng: random.Random, size=(1600, 1200), quality: int = 90) -> bytes:
+    """A green leaf with brown lesions on a noisy background, as JPEG bytes."""
+    w, h = size
+    bg = np.random.default_rng(rng.getrandbits(32)).integers(60, 140, (h, w, 3), dtype=np.uint8)
+    img = Image.fromarray(bg).filter(ImageFilter.GaussianBlur(3))
+    d = ImageDraw.Draw(img)
+    d.ellipse([w * .15, h * .25, w * .85, h * .75],
+              fill=(rng.randint(30, 70), rng.randint(110, 170), rng.randint(30, 70)))
+    for _ in range(rng.randint(0, 12)):
+        x, y, r = rng.uniform(w * .25, w * .75), rng.uniform(h * .35, h * .65), rng.uniform(8, 40)
+        d.ellipse([x - r, y - r, x + r, y + r], fill=(rng.randint(70, 110), 50, 20))
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+def run_info(args: argparse.Namespace) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    import torch
+    return {
+        "commit":    commit,
+        "time":      time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host":      platform.node(),
+        "cpu_count": os.cpu_count(),
+        "python":    platform.python_version(),
+        "torch":     torch.__version__,
+        "args":      {k: v for k, v in vars(args).items() if k != "func"},
+    }
+
+def save(kind: str, results: Dict[str, Any], args: argparse.Namespace) -> None:
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump({"kind": kind, "info": run_info(args), "results": results}, f, indent=2)
+    print(f"📝 Results written to {path}")
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+# --------------------------------------------------------------------- #
+# micro                                                                 #
+# --------------------------------------------------------------------- #
+def micro(args: argparse.Namespace) -> None:
+    import torch
+    from routes import core
+    from services import rule_service, forecast_service
+
+    rng = random.Random(args.seed)
+    photo = synthetic_leaf(rng, (args.photo_width, args.photo_height))
+    img, _ = core.decode_image(photo)
+    model = core.get_model()
+    results: Dict[str, Any] = {"photo_bytes": len(photo)}
+
+    results["decode"]     = time_calls(lambda: core.decode_image(photo), args.repeat)
+    results["preprocess"] = time_calls(lambda: core.preprocess([img]), args.repeat)
+
+    for n in args.batch_sizes:
+        singles = [core.preprocess([img]) for _ in range(n)]
+        batch   = core.preprocess([img] * n)
+        with torch.inference_mode():
+            one_by_one = time_calls(lambda: [model(t) for t in singles], args.forward_repeat, 1)
+            batched    = time_calls(lambda: model(batch), args.forward_repeat, 1)
+        results[f"forward_x{n}"] = {
+            "sequential": one_by_one, "batched": batched,
+            "speedup_p50": round(one_by_one["p50_ms"] / batched["p50_ms"], 2),
+        }
+
+    results["get_recommendation"] = time_calls(
+        lambda: rule_service.get_recommendation(2, 96.0, 27.0, 13.0), args.repeat * 10)
+    grid = np.random.default_rng(args.seed).uniform([15, 70, 0], [35, 100, 24], (10_000, 3))
+    results["weather_risk_scalar_10k"] = time_calls(
+        lambda: [rule_service._weather_risk(t, h, w) for t, h, w in grid], max(5, args.repeat // 10))
+    results["weather_risk_vector_10k"] = time_calls(
+        lambda: rule_service.weather_risk_index(grid[:, 0], grid[:, 1], grid[:, 2]), args.repeat)
+    hours = np.arange(14 * 24)
+    orchards = [{"id": i, "severity_idx": i % 4,
+                 "temperature": (26 + 4 * np.sin(hours / 24 * 2 * np.pi + i)).round(1).tolist(),
+                 "humidity":    (90 + 8 * np.sin(hours / 40 + i)).round(1).tolist()}
+                for i in range(500)]
+    results["forecast_500x336h"] = time_calls(
+        lambda: forecast_service.risk_timeline(orchards), max(5, args.repeat // 10))
+
+    print(json.dumps(results, indent=2))
+    save("micro", results, args)
+
+# --------------------------------------------------------------------- #
+# Pl@ntNet stub                                                         #
+# --------------------------------------------------------------------- #
+def stub_app(latency_ms: float, jitter_ms: float, seed: int):
+    """Answers like /v2/identify/all with a mango as top hit, after a delay."""
+    from fastapi import FastAPI
+    app, rng = FastAPI(), random.Random(seed)
+    calls = {"n": 0}
+
+    @app.post("/v2/identify/all")
+    async def identify():
+        calls["n"] += 1
+        delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        return {"results": [{"score": 0.93, "species": {
+            "scientificName": "Mangifera indica L.", "commonNames": ["Mango"]}}]}
+
+    @app.get("/calls")
+    def count():
+        return calls
+
+    return app
+
+def start_stub(args: argparse.Namespace) -> str:
+    import uvicorn
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        stub_app(args.stub_latency_ms, args.stub_jitter_ms, args.seed),
+        host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v2/identify/all"
+
+# --------------------------------------------------------------------- #
+# e2e                                                                   #
+# --------------------------------------------------------------------- #
+def start_app(workers: int, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    if workers > 1 and os.name != "nt":
+        cmd = [sys.executable, "-c", "import main; main.run_multiworker()"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+               "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=HERE, env={**os.environ, **env, "PORT": str(port),
+                                                "WORKERS": str(workers)},
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+async def wait_ready(client, timeout: float = 180) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError("app did not become ready")
+
+async def load(base_url: str, images: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Closed loop: --concurrency clients, each sending its next request on reply."""
+    import httpx
+    rng = random.Random(args.seed + images)
+    # photos are made up front so generating them is not part of the timing
+    pool = [synthetic_leaf(rng, (args.photo_width, args.photo_height))
+            for _ in range(max(images * 4, args.photo_pool))]
+    form = {"humidity": 96, "temperature": 27, "wetness": 13, "lat": 14.5, "lon": 121.0,
+            "verify_first": str(args.verify).lower()}
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    sent = 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        await wait_ready(client)
+        stop_at = time.monotonic() + args.duration
+
+        async def worker() -> None:
+            nonlocal sent
+            while time.monotonic() < stop_at and (not args.requests or sent < args.requests):
+                sent += 1
+                # trailing bytes after EOI: same decode, new content hash
+                files = [("files", (f"{i}.jpg", rng.choice(pool) + rng.randbytes(8), "image/jpeg"))
+                         for i in range(images)]
+                t0 = time.perf_counter()
+                try:
+                    r = await client.post("/getPrescription", data=form, files=files)
+                    key = str(r.status_code)
+                except Exception as e:
+                    key = type(e).__name__
+                elapsed = time.perf_counter() - t0
+                statuses[key] = statuses.get(key, 0) + 1
+                if key == "200":
+                    latencies.append(elapsed)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+        wall = time.perf_counter() - t0
+
+    ok = statuses.get("200", 0)
+    return {"images": images, "statuses": statuses, "wall_s": round(wall, 3),
+            "throughput_rps":  round(ok / wall, 3),
+            "throughput_ips":  round(ok * images / wall, 3),
+            "latency": percentiles(latencies)}
+
+def e2e(args: argparse.Namespace) -> None:
+    stub_url = start_stub(args)
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {"PLANTNET_URL": stub_url, "JOB_DB": os.path.join(tmp, "jobs.sqlite3"),
+               "HISTORY_DB": "", "LOG_LEVEL": "WARNING", "ADMISSION_QUEUE": str(args.admission_queue)}
+        if not args.cache:
+            env.update(RESULT_CACHE_MB="0", VERIFY_CACHE_SIZE="0")
+        for workers in args.workers:
+            port = free_port()
+            proc = start_app(workers, port, env)
+            try:
+                for images in args.images:
+                    row = asyncio.run(load(f"http://127.0.0.1:{port}", images, args))
+                    row["workers"] = workers
+                    results.append(row)
+                    lat = row["latency"]
+                    print(f"workers={workers} images={images:<2} "
+                          f"{row['throughput_rps']:7.2f} req/s {row['throughput_ips']:7.2f} img/s "
+                          f"p50={lat.get('p50_ms', 0):8.1f} p95={lat.get('p95_ms', 0):8.1f} "
+                          f"p99={lat.get('p99_ms', 0):8.1f} ms  {row['statuses']}")
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+    save("e2e", {"rows": results}, args)
+
+# --------------------------------------------------------------------- #
+# compare                                                               #
+# --------------------------------------------------------------------- #
+def _flatten(d: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(_flatten(v, key + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = float(v)
+    return out
+
+def _rows(run: Dict[str, Any]) -> Dict[str, float]:
+    if run["kind"] == "e2e":
+        return _flatten({f"w{r['workers']}.img{r['images']}":
+                         {"rps": r["throughput_rps"], **r["latency"]}
+                         for r in run["results"]["rows"]})
+    return _flatten(run["results"])
+
+def compare(args: argparse.Namespace) -> None:
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    a, b = _rows(base), _rows(new)
+    print(f"{'metric':<48} {'base':>10} {'new':>10} {'change':>8}")
+    for key in sorted(a.keys() & b.keys()):
+        if not key.endswith(("_ms", "rps")):
+            continue
+        change = (b[key] - a[key]) / a[key] * 100 if a[key] else 0.0
+        print(f"{key:<48} {a[key]:>10.2f} {b[key]:>10.2f} {change:>+7.1f}%")
+
+# --------------------------------------------------------------------- #
+# CLI                                                                   #
+# --------------------------------------------------------------------- #
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--out", default="bench_results")
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--photo-width", type=int, default=1600)
+    ap.add_argument("--photo-height", type=int, default=1200)
+    sub = ap.add_subparsers(dest="kind", required=True)
+
+    m = sub.add_parser("micro")
+    m.add_argument("--repeat", type=int, default=50)
+    m.add_argument("--forward-repeat", type=int, default=10)
+    m.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 10])
+    m.set_defaults(func=micro)
+
+    e = sub.add_parser("e2e")
+    e.add_argument("--workers", type=int, nargs="+", default=[1])
+    e.add_argument("--images", type=int, nargs="+", default=[1, 3, 5, 10])
+    e.add_argument("--concurrency", type=int, default=8)
+    e.add_argument("--duration", type=float, default=20, help="seconds per setting")
+    e.add_argument("--requests", type=int, default=0, help="stop after N requests (0 = time only)")
+    e.add_argument("--photo-pool", type=int, default=20)
+    e.add_argument("--verify", action="store_true", help="verify_first=true via the stub")
+    e.add_argument("--stub-latency-ms", type=float, default=600)
+    e.add_argument("--stub-jitter-ms", type=float, default=200)
+    e.add_argument("--admission-queue", type=int, default=1000)
+    e.add_argument("--cache", action="store_true", help="keep result/verdict caches on")
+    e.set_defaults(func=e2e)
+
+    c = sub.add_parser("compare")
+    c.add_argument("base")
+    c.add_argument("new")
+    c.set_defaults(func=compare)
+
+    args = ap.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# export_models.py
+"""
+One-shot export of the fp32 checkpoint to every inference backend, plus an
+agreement report against fp32 on a labelled folder.
+
+    python export_models.py --formats torchscript onnx int8 int8-dynamic \
+        --calib-dir data/calib --eval-dir data/labelled
+
+--calib-dir   any images of real leaves; needed for static int8
+--eval-dir    one sub-folder per class (Healthy/Mild/Moderate/Severe)
+Report goes to models/export_report.json (see --report).
+"""
+import argparse, json, os, time
+from typing import Dict, List, Tuple
+
+import torch
+
+from routes.core import (CLASS_LABELS, MODEL_PATH, NUM_OUTPUTS, BG_INDEX,
+                         decode_image, preprocess, load_eager)
+from services.model_backends import (ARTIFACTS, BACKENDS, load_backend, export_onnx,
+                                     export_torchscript, export_int8_dynamic,
+                                     export_int8_static)
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+# --------------------------------------------------------------------- #
+# image folders                                                         #
+# --------------------------------------------------------------------- #
+def list_images(root: str) -> List[str]:
+    out = []
+    for d, _, names in os.walk(root):
+        out += [os.path.join(d, n) for n in sorted(names) if n.lower().endswith(IMAGE_EXTS)]
+    return sorted(out)
+
+def load_batches(paths: List[str], batch_size: int) -> List[torch.Tensor]:
+    batches = []
+    for i in range(0, len(paths), batch_size):
+        imgs = []
+        for p in paths[i:i + batch_size]:
+            with open(p, "rb") as f:
+                imgs.append(decode_image(f.read())[0])
+        batches.append(preprocess(imgs))
+    return batches
+
+def labelled_set(root: str) -> Tuple[List[str], List[int]]:
+    paths, labels = [], []
+    for idx, name in enumerate(CLASS_LABELS):
+        for p in list_images(os.path.join(root, name)):
+            paths.append(p)
+            labels.append(idx)
+    return paths, labels
+
+# --------------------------------------------------------------------- #
+# report                                                                #
+# --------------------------------------------------------------------- #
+def run_all(model, batches: List[torch.Tensor]) -> Tuple[torch.Tensor, float]:
+    t0 = time.perf_counter()
+    with torch.inference_mode():
+        logits = torch.cat([model(b) for b in batches])
+    return logits, time.perf_counter() - t0
+
+def compare(eval_dir: str, formats: List[str], batch_size: int) -> Dict[str, Dict]:
+    paths, labels = labelled_set(eval_dir)
+    if not paths:
+        raise SystemExit(f"No labelled images under {eval_dir}/<{'|'.join(CLASS_LABELS)}>/")
+    batches = load_batches(paths, batch_size)
+    truth   = torch.tensor(labels)
+
+    ref, ref_s = run_all(load_eager(), batches)
+    ref_sev    = ref[:, :BG_INDEX].argmax(1)
+    report = {"images": len(paths), "fp32": {
+        "accuracy": round((ref_sev == truth).float().mean().item(), 4),
+        "images_per_s": round(len(paths) / ref_s, 2),
+        "size_mb": round(os.path.getsize(MODEL_PATH) / 2**20, 1),
+    }}
+    for name in formats:
+        logits, secs = run_all(load_backend(name, load_eager), batches)
+        sev = logits[:, :BG_INDEX].argmax(1)
+        report[name] = {
+            "agreement_with_fp32": round((sev == ref_sev).float().mean().item(), 4),
+            "accuracy":            round((sev == truth).float().mean().item(), 4),
+            "max_abs_logit_diff":  round((logits - ref).abs().max().item(), 4),
+            "images_per_s":        round(len(paths) / secs, 2),
+            "size_mb":             round(os.path.getsize(ARTIFACTS[name]) / 2**20, 1),
+        }
+    return report
+
+# --------------------------------------------------------------------- #
+# main                                                                  #
+# --------------------------------------------------------------------- #
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--formats", nargs="+", default=[b for b in BACKENDS if b != "eager"],
+                    choices=[b for b in BACKENDS if b != "eager"])
+    ap.add_argument("--calib-dir")
+    ap.add_argument("--calib-images", type=int, default=256)
+    ap.add_argument("--eval-dir")
+    ap.add_argument("--batch-size", type=int, default=16)
+    ap.add_argument("--report", default="models/export_report.json")
+    args = ap.parse_args()
+
+    model = load_eager()
+    done: List[str] = []
+    for name in args.formats:
+        path = ARTIFACTS[name]
+        t0 = time.perf_counter()
+        if name == "torchscript":
+            export_torchscript(model, path)
+        elif name == "onnx":
+            export_onnx(model, path)
+        elif name == "int8-dynamic":
+            export_int8_dynamic(load_eager(), path)
+        elif name == "int8":
+            if not args.calib_dir:
+                print("⚠️  int8 (static) skipped: --calib-dir is required for calibration")
+                continue
+            calib = list_images(args.calib_dir)[:args.calib_images]
+            export_int8_static(torch.load(MODEL_PATH, map_location="cpu"), NUM_OUTPUTS,
+                               load_batches(calib, args.batch_size), path)
+        print(f"✅ {name:<13} → {path}  ({time.perf_counter() - t0:.1f}s)")
+        done.append(name)
+
+    if args.eval_dir:
+        report = compare(args.eval_dir, done, args.batch_size)
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(json.dumps(report, indent=2))
+        print(f"📝 Report written to {args.report}")
+
+if __name__ == "__main__":
+    main()
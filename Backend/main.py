@@ -1,23 +1,38 @@
 # main.py
 
+import gc
+import logging
 import os
 import subprocess
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 import uvicorn
 
-# Import your routes
-from routes import core
+# Import your routes (the model itself is loaded on startup, see core.get_model)
+from routes import core, bulk, jobs, history, forecast, profiles
+from services import executor_service
+from services.process_info import memory_usage
+from services import metrics_service
+from services.log_service import log_event
+from services.upload_service import BodySizeLimit
 
 # Configuration
 PORT = int(os.getenv("PORT", 8000))
 NGROK_DOMAIN = os.getenv("NGROK_DOMAIN", "gopher-loved-largely.ngrok-free.app")
+WORKERS      = executor_service.SERVER_WORKERS   # server processes sharing one model copy
 
 # Create FastAPI app
 app = FastAPI(title="SuperMango API")
 
 # Include your routers
 app.include_router(core.router)
+app.include_router(bulk.router)
+app.include_router(jobs.router)
+app.include_router(history.router)
+app.include_router(forecast.router)
+app.include_router(profiles.router)
 
 # CORS middleware
 app.add_middleware(
@@ -31,11 +46,71 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger JSON bodies (full bilingual recommendations) for slow links
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# 413 for oversize uploads before the body is fully received
+app.add_middleware(BodySizeLimit)
+
+# Request-level metrics for the prescription path
+@app.middleware("http")
+async def track_prescriptions(request: Request, call_next):
+    if request.url.path != "/getPrescription":
+        return await call_next(request)
+    metrics_service.IN_FLIGHT.inc()
+    t0 = time.perf_counter()
+    try:
+        return await call_next(request)
+    finally:
+        metrics_service.REQUEST_SECONDS.observe(time.perf_counter() - t0)
+        metrics_service.IN_FLIGHT.dec()
+
+@app.get("/metrics")
+def metrics():
+    body, content_type = metrics_service.render()
+    return Response(content=body, media_type=content_type)
+
 # Root endpoint
 @app.get("/")
 def root():
     return {"message": "SuperMango API is running."}
 
+@app.on_event("startup")
+def report_worker_memory():
+    log_event(logging.INFO, "worker_memory", **memory_usage())
+
+def run_multiworker():
+    """
+    Gunicorn with preload_app: the app (and the ResNet-50 weights) is built
+    once in the master, then forked. Workers share the weight pages
+    copy-on-write instead of each loading its own ~100 MB copy.
+    """
+    from gunicorn.app.base import BaseApplication
+
+    class _Server(BaseApplication):
+        def __init__(self, application, options):
+            self.application, self.options = application, options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    # load the weights in the master so every worker inherits them, then
+    # keep the GC from touching (and so un-sharing) those pages
+    core.get_model()
+    gc.freeze()
+    log_event(logging.INFO, "master_memory_before_fork", **memory_usage())
+    _Server(app, {
+        "bind":         f"0.0.0.0:{PORT}",
+        "workers":      WORKERS,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app":  True,
+    }).run()
+
 def start_ngrok():
     """
     Launch ngrok in its own console window so you can see its logs.
@@ -57,8 +132,15 @@ if __name__ == "__main__":
     ngrok_proc = start_ngrok()
 
     # Start the FastAPI server
-    print(f"🚀 Starting SuperMango API on http://0.0.0.0:{PORT}")
-    uvicorn.run(app, host="0.0.0.0", port=PORT)
+    print(f"🚀 Starting SuperMango API on http://0.0.0.0:{PORT} | workers={WORKERS}")
+    if WORKERS > 1 and os.name != "nt":
+        run_multiworker()
+    elif WORKERS > 1:
+        # no fork on Windows: each spawned worker loads its own model copy
+        print("⚠️  Windows: workers cannot share model memory")
+        uvicorn.run("main:app", host="0.0.0.0", port=PORT, workers=WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=PORT)
 
     # When the server stops, terminate ngrok
     if ngrok_proc:
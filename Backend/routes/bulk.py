@@ -0,0 +1,162 @@
+"""
+Orchard-scale bulk scanning: many trees per request, results streamed back
+as newline-delimited JSON as each tree finishes.
+
+POST /bulkPrescription   (multipart)
+    files     + tree_ids   one tree id per file, in the same order, or
+    archive                a .zip with one folder per tree: <tree_id>/<leaf>.jpg
+                           (<leaf>.rgb with input_format=rgb8)
+    weather                JSON {"<tree_id>": {humidity, temperature, wetness, lat?, lon?},
+                                 "*": {...default for trees not listed...}}
+    lang, compact,         as for /getPrescription (input_format applies to every image)
+    input_format
+
+files + tree_ids go through the regular multipart parser, which stops at
+1000 files and 1000 form fields per request (400); send larger batches
+(over ~1000 images) as an archive.
+
+Each output line is the /getPrescription response for one tree plus
+`tree_id`, `images` and per-image `labels`, or {"tree_id", "error"}. The
+last line is {"done": true, "trees": N, "failed": M}. Trees run concurrently
+(BULK_CONCURRENCY) so their images share micro-batches in the model.
+Pl@ntNet verification is not applied to bulk uploads.
+"""
+import asyncio, json, logging, os, threading, zipfile
+from collections import OrderedDict
+from typing      import Any, AsyncIterator, Dict, List
+
+from fastapi           import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+
+from routes.core               import (infer_cached, severities, summarize, build_response,
+                                       record_scan, INPUT_FORMATS)
+from services.metrics_service  import StageTimer
+from services.upload_service   import MAX_FILE_BYTES, Loader, upload_loader
+from services.rule_service     import LANGS
+from services.log_service      import log_event
+
+router = APIRouter()
+
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", 8))      # trees in flight
+IMAGE_EXTS = {"image": (".jpg", ".jpeg", ".png", ".webp"), "rgb8": (".rgb",)}
+WEATHER_FIELDS = ("humidity", "temperature", "wetness")
+
+# --------------------------------------------------------------------- #
+# input parsing                                                         #
+# --------------------------------------------------------------------- #
+def _group_uploads(files: List[UploadFile], tree_ids: List[str]) -> Dict[str, List[Loader]]:
+    if len(files) != len(tree_ids):
+        raise HTTPException(status_code=400, detail="tree_ids must have one entry per file")
+    trees: Dict[str, List[Loader]] = OrderedDict()
+    for upload, tree_id in zip(files, tree_ids):
+        trees.setdefault(tree_id, []).append(upload_loader(upload))
+    return trees
+
+def _group_archive(archive: UploadFile, input_format: str) -> Dict[str, List[Loader]]:
+    try:
+        zf = zipfile.ZipFile(archive.file)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="archive is not a valid zip file")
+    lock = threading.Lock()                      # ZipFile reads are not thread-safe
+
+    def read(info: zipfile.ZipInfo) -> bytes:
+        if info.file_size > MAX_FILE_BYTES:
+            raise ValueError(f"{info.filename} exceeds {MAX_FILE_BYTES // 2**20} MB")
+        with lock:
+            return zf.read(info)
+
+    trees: Dict[str, List[Loader]] = OrderedDict()
+    for info in zf.infolist():
+        parts = info.filename.strip("/").split("/")
+        if (info.is_dir() or len(parts) < 2
+                or not parts[-1].lower().endswith(IMAGE_EXTS[input_format])):
+            continue
+        tree_id = parts[-2]
+        trees.setdefault(tree_id, []).append(lambda i=info: asyncio.to_thread(read, i))
+    return trees
+
+def _parse_weather(raw: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        weather = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"weather is not valid JSON: {e}")
+    if not isinstance(weather, dict):
+        raise HTTPException(status_code=400, detail="weather must be a JSON object keyed by tree id")
+    return weather
+
+# --------------------------------------------------------------------- #
+# per-tree scoring                                                      #
+# --------------------------------------------------------------------- #
+async def _score_tree(tree_id: str, loaders: List[Loader], w: Dict[str, Any] | None,
+                      lang: str, compact: bool, input_format: str) -> Dict[str, Any]:
+    if w is None or any(k not in w for k in WEATHER_FIELDS):
+        return {"tree_id": tree_id, "error": "missing weather (humidity/temperature/wetness)"}
+    try:
+        values = [float(w[k]) for k in WEATHER_FIELDS]
+        lat, lon = (None if w.get(k) is None else float(w[k]) for k in ("lat", "lon"))
+    except (TypeError, ValueError):
+        return {"tree_id": tree_id, "error": "weather values and lat/lon must be numbers"}
+    # background admission slot (never rejected); re-submits hit the cache
+    logits = await infer_cached(loaders, StageTimer(), input_format, bounded=False)
+    preds, psi, _, overall_idx = summarize(severities(logits))
+    response = build_response(psi, overall_idx, *values, lat, lon, lang, compact)
+    record_scan(response, preds, "bulk")
+    return {"tree_id": tree_id, "images": len(loaders),
+            "labels": [p["label"] for p in preds], **response}
+
+async def _stream(trees: Dict[str, List[Loader]], weather: Dict[str, Dict[str, Any]],
+                  lang: str, compact: bool, input_format: str) -> AsyncIterator[bytes]:
+    sem = asyncio.Semaphore(BULK_CONCURRENCY)
+    default = weather.get("*")
+
+    async def run(tree_id: str, loaders: List[Loader]) -> Dict[str, Any]:
+        async with sem:
+            try:
+                return await _score_tree(tree_id, loaders, weather.get(tree_id, default),
+                                         lang, compact, input_format)
+            except Exception as e:                       # one bad tree must not end the stream
+                return {"tree_id": tree_id, "error": f"{type(e).__name__}: {e}"}
+
+    tasks = [asyncio.create_task(run(t, l)) for t, l in trees.items()]
+    failed = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            failed += "error" in result
+            yield (json.dumps(result, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        yield (json.dumps({"done": True, "trees": len(tasks), "failed": failed}) + "\n").encode()
+    finally:
+        for t in tasks:                                   # client went away
+            t.cancel()
+        log_event(logging.INFO, "bulk_done", trees=len(tasks), failed=failed)
+
+# --------------------------------------------------------------------- #
+# route                                                                 #
+# --------------------------------------------------------------------- #
+@router.post("/bulkPrescription")
+async def bulkPrescription(
+    weather:  str                      = Form(...),
+    files:    List[UploadFile] | None  = File(None),
+    tree_ids: List[str] | None         = Form(None),
+    archive:  UploadFile | None        = File(None),
+    lang:     str                      = Form("both"),
+    compact:  bool                     = Form(False),
+    input_format: str                  = Form("image"),
+):
+    if lang not in LANGS:
+        raise HTTPException(status_code=400, detail=f"Unknown lang: {lang}")
+    if input_format not in INPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown input_format: {input_format}")
+    if archive is not None:
+        trees = _group_archive(archive, input_format)
+    elif files:
+        trees = _group_uploads(files, tree_ids or [])
+    else:
+        raise HTTPException(status_code=400, detail="send files + tree_ids, or an archive")
+    if not trees:
+        raise HTTPException(status_code=400, detail="no images found")
+
+    log_event(logging.INFO, "bulk_request", trees=len(trees),
+              images=sum(len(v) for v in trees.values()))
+    return StreamingResponse(_stream(trees, _parse_weather(weather), lang, compact, input_format),
+                             media_type="application/x-ndjson")
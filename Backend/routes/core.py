@@ -1,153 +1,246 @@
-from fastapi            import FastAPI, APIRouter, UploadFile, File, Form
-from fastapi.responses  import JSONResponse
-from typing             import List, Dict, Any
+import time
+_IMPORT_T0 = time.perf_counter()
+
+from fastapi            import FastAPI, APIRouter, UploadFile, File, Form, HTTPException, Header
+from fastapi.responses  import JSONResponse, Response
+from typing             import List, Dict, Any, Tuple
 from PIL                import Image
-from textwrap           import indent
-import io, os, json, requests, torch
+import asyncio, io, os, logging, threading, torch
 import torchvision.models as models
 import torchvision.transforms as T
 
-from services.rule_service import get_recommendation
-
-# ───────────────────  Pl@ntNet validator helpers  ─────────────────────
-PLANTNET_API_KEY = os.getenv("PLANTNET_API_KEY", "2b10p7W1flrJ7h045oF5cDmzou")
-PLANTNET_URL     = "https://my-api.plantnet.org/v2/identify/all"
-MANGO_KEYWORDS   = ("mango", "mangifera")
-
-def simple_name(sp: Dict[str, Any]) -> str:
-    commons = sp.get("commonNames", [])
-    return commons[0] if commons else sp.get("scientificName", "Unknown").split()[0]
-
-def is_mango_leaf(img_bytes: bytes) -> tuple[bool, str | None]:
-    """Return (True, None) if mango detected in top-8, else (False, reason)."""
-    files = [
-        ('images', ('upload.jpg', io.BytesIO(img_bytes), 'image/jpeg')),
-        ('organs', (None, 'leaf')),
-    ]
-    try:
-        r = requests.post(PLANTNET_URL, files=files,
-                          params={'api-key': PLANTNET_API_KEY}, timeout=12)
-
-        if r.status_code == 404:
-            return False, "NOT_A_PLANT"
-        r.raise_for_status()
-
-        res = r.json().get("results", [])
-        if not res:
-            return False, "NOT_A_PLANT"
-
-        # look through top-10 predictions
-        for hit in res[:15]:
-            sp = hit.get("species", {})
-            sci = (sp.get("scientificName") or "").lower()
-            com = " ".join(sp.get("commonNames", [])).lower()
-            if any(k in sci or k in com for k in MANGO_KEYWORDS):
-                return True, None
-
-        return False, simple_name(res[0].get("species", {}))
-
-    except requests.exceptions.HTTPError as e:
-        return False, f"API_ERROR:{e.response.status_code}"
-    except Exception as e:
-        return False, f"REQUEST_FAILED:{str(e)}"
+from services.rule_service      import (get_recommendation, format_recommendation, catalog, LANGS,
+                                        CATALOG_VERSION)
+from services.inference_batcher import InferenceBatcher
+from services.model_backends    import load_backend, ARTIFACTS
+from services.plantnet_service  import verify_all, close_client, verify_cache
+from services.cache_service     import ResultCache
+from services.upload_service    import (Loader, check_uploads, upload_loader, MAX_FILES,
+                                        MAX_FILE_BYTES, MAX_REQUEST_BYTES, IMAGE_FORMATS)
+from services.admission_service import admission, ADMISSION_LIMIT
+from services.history_service   import history
+from services.profile_service   import profiler, current as current_profile
+from services                   import executor_service
+from services.executor_service  import run_cpu
+from services                   import metrics_service
+from services.metrics_service   import StageTimer, PRESCRIPTIONS, IMAGES_PER_REQUEST
+from services.log_service       import log_event, log_sampled_response
 
 # ───────────────  ResNet-50 model (5 outputs, ignore BG)  ─────────────
 CLASS_LABELS = ["Healthy", "Mild", "Moderate", "Severe"]
 MODEL_PATH   = "models/best_fold_model.pt"
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "eager")   # see services/model_backends.py
 NUM_OUTPUTS  = 5                      # Healthy-Severe-BG
 BG_INDEX     = 4
+MAX_BATCH_SIZE    = int(os.getenv("MAX_BATCH_SIZE", 16))        # images per forward pass
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", 5))    # cross-request flush window
+
+INPUT_SIZE = (224, 224)
+TRANSFORM  = T.Compose([T.Resize(INPUT_SIZE), T.ToTensor()])
 
-TRANSFORM = T.Compose([T.Resize((224, 224)), T.ToTensor()])
+WARMUP_ITERS       = int(os.getenv("WARMUP_ITERS", 2))             # 0 disables warm-up
+WARMUP_BATCH_SIZES = [int(n) for n in os.getenv("WARMUP_BATCH_SIZES", "1,4").split(",") if n]
 
-def load_model() -> torch.nn.Module:
+def model_version() -> str:
+    """Backend + identity of the weights file, so results never outlive a model swap."""
+    if os.getenv("MODEL_VERSION"):
+        return os.environ["MODEL_VERSION"]
+    path = ARTIFACTS.get(MODEL_BACKEND, MODEL_PATH)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return f"{MODEL_BACKEND}-unversioned"
+    return f"{MODEL_BACKEND}-{st.st_size}-{st.st_mtime_ns}"
+
+def load_eager() -> torch.nn.Module:
     m = models.resnet50(weights=None)
     m.fc = torch.nn.Linear(m.fc.in_features, NUM_OUTPUTS)
-    m.load_state_dict(torch.load(MODEL_PATH, map_location="cpu"))
+    try:
+        # memory-mapped: weights are paged in from the file on demand and the
+        # clean pages are shared by every process that maps the same file
+        state = torch.load(MODEL_PATH, map_location="cpu", mmap=True, weights_only=True)
+        m.load_state_dict(state, assign=True)
+    except TypeError:                       # torch < 2.1: no mmap/assign
+        m.load_state_dict(torch.load(MODEL_PATH, map_location="cpu"))
     m.eval()
     return m
 
-model = load_model()
+def load_model():
+    """fp32 eager model, or the exported artifact selected by MODEL_BACKEND."""
+    log_event(logging.INFO, "model_loading", backend=MODEL_BACKEND)
+    return load_backend(MODEL_BACKEND, load_eager)
+
+# ───────────────  Model lifecycle (lazy load + warm-up)  ─────────────
+model = None
+_model_lock = threading.Lock()
+lifecycle: Dict[str, Any] = {
+    "backend": MODEL_BACKEND, "ready": False,
+    "import_s": None, "load_s": None, "warmup_s": None,
+}
+
+def get_model():
+    """The loaded model; loads it on first use (e.g. in a process-pool worker)."""
+    global model
+    if model is None:
+        with _model_lock:
+            if model is None:
+                t0 = time.perf_counter()
+                loaded = load_model()
+                lifecycle["load_s"] = round(time.perf_counter() - t0, 3)
+                model = loaded
+    return model
+
+def warm_up() -> float:
+    """Run dummy batches so allocator and kernel set-up happen before traffic."""
+    m  = get_model()
+    t0 = time.perf_counter()
+    with torch.inference_mode():
+        for _ in range(WARMUP_ITERS):
+            for n in WARMUP_BATCH_SIZES:
+                m(torch.zeros((n, 3, *INPUT_SIZE)))
+    return round(time.perf_counter() - t0, 3)
+
+def prepare() -> Dict[str, Any]:
+    """Load + warm up in the calling process; returns that process's timings."""
+    get_model()
+    lifecycle["warmup_s"] = warm_up()
+    return {"load_s": lifecycle["load_s"], "warmup_s": lifecycle["warmup_s"]}
+
+def decode_image(raw: bytes) -> Tuple[Image.Image, Tuple[int, int]]:
+    """
+    Decode an upload once, straight to model input size.
+    JPEGs use Pillow's draft mode (DCT scaling), so a 12-MP photo is decoded
+    at 1/2-1/8 scale instead of full resolution. Returns (image, original size).
+    """
+    img  = Image.open(io.BytesIO(raw))
+    size = img.size
+    if img.format == "JPEG":
+        img.draft("RGB", INPUT_SIZE)           # never below INPUT_SIZE
+    img = img.convert("RGB")
+    if img.size != INPUT_SIZE:
+        img = img.resize(INPUT_SIZE, Image.BILINEAR, reducing_gap=2.0)
+    return img, size
+
+# Clients may send photos already at INPUT_SIZE (see GET /capabilities):
+#   "image"  any JPEG/PNG/WebP; at exactly 224×224 decode_image skips the resize
+#   "rgb8"   packed 224×224×3 uint8 RGB, row-major HWC; wrapped, never decoded
+INPUT_FORMATS = ("image", "rgb8")
+RGB8_BYTES    = INPUT_SIZE[0] * INPUT_SIZE[1] * 3
+
+def decode_rgb8(raw: bytes) -> Tuple[Image.Image, Tuple[int, int]]:
+    """Packed RGB bytes -> (image, INPUT_SIZE), without copying or resizing."""
+    if len(raw) != RGB8_BYTES:
+        raise ValueError(f"rgb8 input must be {RGB8_BYTES} bytes, got {len(raw)}")
+    return Image.frombuffer("RGB", INPUT_SIZE, raw, "raw", "RGB", 0, 1), INPUT_SIZE
+
+def rgb8_to_jpeg(raw: bytes) -> bytes:
+    """A small JPEG of an rgb8 input, for Pl@ntNet (which needs a photo)."""
+    buf = io.BytesIO()
+    decode_rgb8(raw)[0].save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+DECODERS = {"image": decode_image, "rgb8": decode_rgb8}
+
+def preprocess(images: List[Image.Image]) -> torch.Tensor:
+    """PIL images -> one (N, 3, 224, 224) input tensor."""
+    if not images:
+        return torch.empty((0, 3, 224, 224))
+    return torch.stack([TRANSFORM(img) for img in images])
+
+def forward_batch(batch: torch.Tensor) -> torch.Tensor:
+    """
+    Run a preprocessed batch through the model in chunks of at most
+    MAX_BATCH_SIZE with autograd off. Returns raw logits, shape (N, 5).
+    """
+    with torch.inference_mode():
+        m = get_model()
+        return torch.cat([m(chunk) for chunk in batch.split(MAX_BATCH_SIZE)])
+
+def predict_logits(images: List[Image.Image]) -> torch.Tensor:
+    """Synchronous preprocess + forward, for callers outside the batcher."""
+    return forward_batch(preprocess(images))
+
+# images from concurrent requests are flushed through the model together
+batcher = InferenceBatcher(forward_batch, NUM_OUTPUTS, MAX_BATCH_SIZE, BATCH_MAX_WAIT_MS,
+                           run=run_cpu)
+
+# ───────────────  Inference result cache  ─────────────
+RESULT_CACHE_MB = float(os.getenv("RESULT_CACHE_MB", 16))        # 0 disables
+result_cache    = ResultCache(RESULT_CACHE_MB, NUM_OUTPUTS, model_version())
+
+# ───────────────  Local BG pre-filter (verify_mode="local")  ─────────────
+VERIFY_MODE     = os.getenv("VERIFY_MODE", "plantnet")         # "plantnet" | "local"
+BG_LEAF_MAX     = float(os.getenv("BG_LEAF_MAX", 0.10))       # P(BG) ≤ this → leaf
+BG_REJECT_MIN   = float(os.getenv("BG_REJECT_MIN", 0.90))     # P(BG) ≥ this → background
+
+prefilter_counts = {"images": 0, "local_leaf": 0, "local_background": 0, "escalated": 0}
+
+def bg_decisions(logits: torch.Tensor) -> List[str]:
+    """
+    Per image: "leaf", "background" or "uncertain" from the softmax
+    probability of the BG output. Only "uncertain" goes to Pl@ntNet.
+    """
+    p_bg = torch.softmax(logits, dim=1)[:, BG_INDEX].tolist()
+    out  = ["leaf"       if p <= BG_LEAF_MAX   else
+            "background" if p >= BG_REJECT_MIN else "uncertain" for p in p_bg]
+    prefilter_counts["images"]           += len(out)
+    prefilter_counts["local_leaf"]       += out.count("leaf")
+    prefilter_counts["local_background"] += out.count("background")
+    prefilter_counts["escalated"]        += out.count("uncertain")
+    return out
 
 # ─────────────────────────── FastAPI setup ───────────────────────────
 app, router = FastAPI(title="SuperMango API"), APIRouter()
 
 # --------------------------------------------------------------------- #
-# logging helpers (verbatim)                                            #
+# logging helpers (structured, see services/log_service.py)             #
 # --------------------------------------------------------------------- #
-def log_image(idx: int, image: Image.Image) -> None:
-    w, h = image.size
-    print(f"🖼️  {idx:02d} | {w}×{h} | {image.mode}")
+def log_image(idx: int, image: Image.Image, size: Tuple[int, int] | None = None,
+              nbytes: int | None = None) -> None:
+    w, h = size or image.size
+    log_event(logging.DEBUG, "image", idx=idx, width=w, height=h, mode=image.mode)
+    prof = current_profile.get()
+    if prof is not None:
+        prof.add_image(idx=idx, width=w, height=h, mode=image.mode, bytes=nbytes)
 
 def log_summary(preds: List[Dict[str, Any]], psi: float, overall: str, _c: float) -> None:
-    print("\n────────── Batch summary ──────────")
-    for p in preds:
-        print(f" • {p['idx']:02d}  {p['label']}")
-    print("───────────────────────────────────")
-    print(f" PSI: {psi:6.2f}%   Overall: {overall}")
-    print("───────────────────────────────────\n")
+    log_event(logging.INFO, "prescription", psi=psi, overall=overall,
+              fields=lambda: {"labels": [p["label"] for p in preds]})
 
 def log_response_json(resp: Dict[str, Any] | str) -> None:
-    print("📤 Response JSON ↓\n" + indent(json.dumps(resp, indent=2), "  ") + "\n")
+    log_sampled_response(resp)
 
-# ───────────────────────────── API route ─────────────────────────────
-@router.post("/getPrescription")
-async def getPrescription(
-    files:        List[UploadFile] = File(...),
-    humidity:     float           = Form(...),
-    temperature:  float           = Form(...),
-    wetness:      float           = Form(...),
-    lat:          float           = Form(...),
-    lon:          float           = Form(...),
-    verify_first: bool            = Form(False),
-):
-    print(f"\n📷  Received {len(files)} image(s) | verify_first={verify_first}")
-
-    batch_bytes: List[bytes] = []
-    for idx, upload in enumerate(files):
-        raw = await upload.read()
-        img = Image.open(io.BytesIO(raw)).convert("RGB")
-        log_image(idx, img)
-
-        if verify_first:
-            ok, info = is_mango_leaf(raw)
-            if not ok:
-                reason = "NOT_A_PLANT" if info == "NOT_A_PLANT" else f"NOT_MANGO: {info}"
-                print(f"⛔ {reason}")
-                log_response_json("RETAKE_PHOTO_AGAIN")
-                return JSONResponse(content="RETAKE_PHOTO_AGAIN")
-            print("✅ Mango leaf")
-        else:
-            print("⚠️  Skipped verification")
+# ───────────────────────  PSI, overall & response  ───────────────────
+AREA = {0: 0, 1: 2, 2: 8, 3: 15}          # % leaf area per severity class
 
-        batch_bytes.append(raw)
+def severities(all_logits: torch.Tensor) -> List[int]:
+    return torch.argmax(all_logits[:, :BG_INDEX], dim=1).tolist()   # drop BG logit
 
-    # ───── severity inference ────────────────────────────────────────
-    preds: List[Dict[str, Any]] = []
-    for idx, b in enumerate(batch_bytes):
-        img = Image.open(io.BytesIO(b)).convert("RGB")
-        logits = model(TRANSFORM(img).unsqueeze(0))
-        logits = logits[0][:BG_INDEX]          # drop BG logit
-        sev    = int(torch.argmax(logits))
-        preds.append({"idx": idx, "label": CLASS_LABELS[sev], "severity": sev})
-
-    # ───── PSI & overall  ────────────────────────────────────────────
-    area = {0: 0, 1: 2, 2: 8, 3: 15}
-    psi  = round(sum(area[p["severity"]] for p in preds) / len(preds), 2)
+def summarize(sevs: List[int]) -> Tuple[List[Dict[str, Any]], float, str, int]:
+    """Per-image predictions -> (preds, PSI, overall label, overall index)."""
+    preds: List[Dict[str, Any]] = [
+        {"idx": idx, "label": CLASS_LABELS[sev], "severity": sev}
+        for idx, sev in enumerate(sevs)
+    ]
+    psi  = round(sum(AREA[p["severity"]] for p in preds) / len(preds), 2)
     overall = ("Healthy" if psi == 0 else
                "Mild"    if psi <= 3 else
                "Moderate"if psi <= 12 else "Severe")
-    overall_idx = CLASS_LABELS.index(overall)
+    return preds, psi, overall, CLASS_LABELS.index(overall)
 
-    recommendation = get_recommendation(
+def build_response(psi: float, overall_idx: int, humidity: float, temperature: float,
+                   wetness: float, lat: float | None, lon: float | None,
+                   lang: str = "both", compact: bool = False) -> Dict[str, Any]:
+    recommendation = format_recommendation(get_recommendation(
         severity_idx = overall_idx,
         humidity     = humidity,
         temperature  = temperature,
         wetness      = wetness,
-    )
+    ), overall_idx, lang, compact)
 
-    response: Dict[str, Any] = {
+    return {
         "percent_severity_index": psi,
-        "overall_label":          overall,
+        "overall_label":          CLASS_LABELS[overall_idx],
         "overall_severity_index": overall_idx,
         "weather": {
             "humidity": humidity,
@@ -159,8 +252,312 @@ async def getPrescription(
         "recommendation": recommendation,
     }
 
+def record_scan(response: Dict[str, Any], preds: List[Dict[str, Any]], source: str) -> None:
+    """Append a finished scan to the history store (services/history_service.py)."""
+    w = response["weather"]
+    history.record(w["lat"], w["lon"], [p["severity"] for p in preds],
+                   response["percent_severity_index"], response["overall_severity_index"],
+                   response["recommendation"]["weather_risk"], w, source)
+
+# ───────────────────────────── API route ─────────────────────────────
+async def _infer(images: List[Image.Image], timer: StageTimer) -> torch.Tensor:
+    """Preprocess + batched forward; (N, 5) logits."""
+    with timer("preprocess"):
+        batch = await run_cpu(preprocess, images)
+    with timer("forward"):                         # includes micro-batch queueing
+        return await batcher.submit(batch)
+
+async def infer_cached(loaders: List[Loader], timer: StageTimer,
+                       input_format: str = "image", bounded: bool = True) -> torch.Tensor:
+    """
+    (N, 5) logits for uploads read through `loaders`. Files are read one at
+    a time, hashed, and either answered from `result_cache` (same bytes,
+    same input format, same model version) or decoded to 224×224 (rgb8 inputs are only
+    wrapped); the raw bytes are dropped before the next file is read. Only
+    the misses go through the model. Runs inside an admission slot
+    (interactive if `bounded`, else background; may raise 429/503).
+    """
+    async with admission.slot(bounded):
+        return await _infer_cached(loaders, timer, input_format)
+
+async def _infer_cached(loaders: List[Loader], timer: StageTimer,
+                        input_format: str) -> torch.Tensor:
+    keys:   List[str] = []
+    cached: Dict[int, Tuple[float, ...]] = {}
+    misses: Dict[str, List[int]] = {}                # duplicates in one upload run once
+    images: List[Image.Image] = []
+    decode = DECODERS[input_format]
+    for i, load in enumerate(loaders):
+        with timer("read"):
+            raw = await load()
+        with timer("cache"):
+            key = await asyncio.to_thread(result_cache.key, raw, input_format)
+            row = result_cache.get_many([key])[0]
+        keys.append(key)
+        if row is not None:
+            cached[i] = row
+        elif key in misses:
+            misses[key].append(i)
+        else:
+            misses[key] = [i]
+            with timer("decode"):
+                img, size = await run_cpu(decode, raw)         # the only decode of this upload
+            log_image(i, img, size, len(raw))
+            images.append(img)
+        del raw
+
+    logits = torch.empty((len(loaders), NUM_OUTPUTS))
+    if misses:
+        fresh = await _infer(images, timer)
+        for (key, idxs), row in zip(misses.items(), fresh):
+            logits[idxs] = row
+            result_cache.set(key, row.tolist())
+    for i, row in cached.items():
+        logits[i] = torch.tensor(row)
+    return logits
+
+async def prescribe(
+    loaders:      List[Loader],
+    humidity:     float,
+    temperature:  float,
+    wetness:      float,
+    lat:          float | None,
+    lon:          float | None,
+    verify_first: bool       = False,
+    verify_mode:  str | None = None,
+    lang:         str        = "both",
+    compact:      bool       = False,
+    timer:        StageTimer | None = None,
+    source:       str        = "scan",
+    input_format: str        = "image",
+    bounded:      bool       = True,
+) -> Dict[str, Any] | str:
+    """
+    (Verify) -> infer (cached) -> recommend for one upload. Returns the
+    /getPrescription response dict, or "RETAKE_PHOTO_AGAIN". Shared by the
+    synchronous endpoint and the job workers (routes/jobs.py, `bounded`
+    False). Raw bytes are only held together while they are being sent to
+    Pl@ntNet; only inference holds an admission slot, not verification.
+    """
+    verify_mode = verify_mode or VERIFY_MODE
+    timer = timer or StageTimer()
+    IMAGES_PER_REQUEST.observe(len(loaders))
+
+    async def photo(load: Loader) -> bytes:          # what Pl@ntNet is sent
+        raw = await load()
+        return await run_cpu(rgb8_to_jpeg, raw) if input_format == "rgb8" else raw
+
+    all_logits: torch.Tensor | None = None
+
+    if verify_first:
+        if verify_mode == "local":
+            # run the model first; only images with an uncertain BG
+            # probability are escalated to Pl@ntNet
+            all_logits = await infer_cached(loaders, timer, input_format, bounded)
+            decisions  = bg_decisions(all_logits)
+            if "background" in decisions:
+                ok, info = False, "NOT_A_PLANT"
+            else:
+                escalate = [load for load, d in zip(loaders, decisions) if d == "uncertain"]
+                log_event(logging.DEBUG, "prefilter", decided=len(loaders) - len(escalate),
+                          escalated=len(escalate))
+                with timer("verify"):
+                    ok, info = (await verify_all([await photo(load) for load in escalate])
+                                if escalate else (True, None))
+        else:
+            # all images are read before verification starts (unlike checking
+            # one upload at a time), then verified concurrently; stops at the
+            # first rejection to complete
+            with timer("verify"):
+                ok, info = await verify_all([await photo(load) for load in loaders])
+        if not ok:
+            reason = "NOT_A_PLANT" if info == "NOT_A_PLANT" else f"NOT_MANGO: {info}"
+            log_event(logging.INFO, "rejected", reason=reason)
+            timer.observe()
+            PRESCRIPTIONS.labels("RETAKE_PHOTO_AGAIN").inc()
+            log_response_json("RETAKE_PHOTO_AGAIN")
+            return "RETAKE_PHOTO_AGAIN"
+        log_event(logging.DEBUG, "verified")
+    else:
+        log_event(logging.DEBUG, "verification_skipped")
+
+    # ───── severity inference ────────────────────────────────────────
+    if all_logits is None:
+        all_logits = await infer_cached(loaders, timer, input_format, bounded)
+    preds, psi, overall, overall_idx = summarize(severities(all_logits))
+
+    with timer("recommendation"):
+        response = build_response(psi, overall_idx, humidity, temperature, wetness,
+                                  lat, lon, lang, compact)
+
+    record_scan(response, preds, source)
+    timer.observe()
+    PRESCRIPTIONS.labels(overall).inc()
     log_summary(preds, psi, overall, 0.0)
     log_response_json(response)
     return response
 
-app.include_router(router)
\ No newline at end of file
+def check_options(verify_mode: str | None, lang: str, input_format: str = "image") -> None:
+    """400 for option values prescribe() does not know."""
+    if (verify_mode or VERIFY_MODE) not in ("plantnet", "local"):
+        raise HTTPException(status_code=400, detail=f"Unknown verify_mode: {verify_mode}")
+    if lang not in LANGS:
+        raise HTTPException(status_code=400, detail=f"Unknown lang: {lang}")
+    if input_format not in INPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown input_format: {input_format}")
+
+def raw_size(input_format: str) -> int | None:
+    """Exact part size check_uploads enforces for packed inputs."""
+    return RGB8_BYTES if input_format == "rgb8" else None
+
+@router.post("/getPrescription")
+async def getPrescription(
+    files:        List[UploadFile] = File(...),
+    humidity:     float           = Form(...),
+    temperature:  float           = Form(...),
+    wetness:      float           = Form(...),
+    lat:          float           = Form(...),
+    lon:          float           = Form(...),
+    verify_first: bool            = Form(False),
+    verify_mode:  str | None      = Form(None),
+    lang:         str             = Form("both"),     # "both" | "en" | "tl"
+    compact:      bool            = Form(False),      # recommendation id only
+    input_format: str             = Form("image"),    # "image" | "rgb8", see /capabilities
+    x_profile:     str | None     = Header(None),     # with X-Admin-Token, see profile_service
+    x_admin_token: str | None     = Header(None),
+):
+    log_event(logging.INFO, "request", images=len(files), verify_first=verify_first,
+              verify_mode=verify_mode or VERIFY_MODE)
+    timer = StageTimer()
+    async with profiler.request("/getPrescription", x_profile, x_admin_token, timer) as prof:
+        check_options(verify_mode, lang, input_format)
+        await check_uploads(files, raw_size(input_format))
+
+        # inference waits for an admission slot: 429/503 + Retry-After when saturated
+        response = await prescribe([upload_loader(f) for f in files], humidity,
+                                   temperature, wetness, lat, lon, verify_first,
+                                   verify_mode, lang, compact, timer,
+                                   input_format=input_format)
+    headers = {"X-Profile-Id": prof.id} if prof is not None else None
+    if isinstance(response, str) or headers:
+        return JSONResponse(content=response, headers=headers)
+    return response
+
+@router.get("/recommendations")
+def recommendations(
+    lang:            str        = "both",
+    if_none_match:   str | None = Header(None),
+    accept_encoding: str        = Header(""),
+):
+    """
+    Versioned catalog of every recommendation text, keyed by the ids that
+    compact /getPrescription responses return. Pre-serialized and
+    pre-gzipped; answers 304 when the client's ETag is current.
+    """
+    if lang not in LANGS:
+        raise HTTPException(status_code=400, detail=f"Unknown lang: {lang}")
+    body, gz, etag = catalog(lang)
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400", "Vary": "Accept-Encoding"}
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    if "gzip" in accept_encoding:
+        return Response(gz, media_type="application/json",
+                        headers={**headers, "Content-Encoding": "gzip"})
+    return Response(body, media_type="application/json", headers=headers)
+
+def _normalization() -> Dict[str, Any]:
+    """What TRANSFORM does after ToTensor (x / 255), read from the pipeline itself."""
+    norm = next((t for t in TRANSFORM.transforms if isinstance(t, T.Normalize)), None)
+    return {"scale": 1 / 255,
+            "mean":  list(norm.mean) if norm else [0.0, 0.0, 0.0],
+            "std":   list(norm.std)  if norm else [1.0, 1.0, 1.0]}
+
+@router.get("/capabilities")
+def capabilities():
+    """
+    What a client needs to resize on the phone and send `input_format`
+    rgb8 (or a 224×224 JPEG) instead of the full photo.
+    """
+    w, h = INPUT_SIZE
+    return {
+        "model_version":   model_version(),
+        "catalog_version": CATALOG_VERSION,
+        "input": {
+            "width": w, "height": h, "channels": 3, "color": "RGB",
+            "resize": "bilinear, stretched to width×height (aspect ratio not kept)",
+        },
+        "normalization": _normalization(),
+        "input_formats": {
+            "image": {"content_types": [f"image/{f}" for f in IMAGE_FORMATS],
+                      "note": f"any size; exactly {w}×{h} skips the server-side resize"},
+            "rgb8":  {"content_type": "application/octet-stream", "bytes": RGB8_BYTES,
+                      "dtype": "uint8", "layout": "HWC", "order": "row-major, top row first"},
+        },
+        "limits": {"max_files": MAX_FILES, "max_file_bytes": MAX_FILE_BYTES,
+                   "max_request_bytes": MAX_REQUEST_BYTES},
+    }
+
+@router.get("/stats/inference")
+def inference_stats():
+    """Queue depth, batch-size histogram and wait times of the micro-batcher."""
+    return batcher.stats()
+
+@router.get("/stats/verification")
+def verification_stats():
+    """Hit/miss counters of the Pl@ntNet verdict cache."""
+    return verify_cache.stats()
+
+@router.get("/stats/admission")
+def admission_stats():
+    """Concurrency limit, requests running / waiting, and rejections."""
+    return admission.stats()
+
+@router.get("/stats/results")
+def result_cache_stats():
+    """Hit rate and size of the per-image inference result cache."""
+    return {**result_cache.stats(), "model_version": result_cache.model_version}
+
+@router.get("/stats/prefilter")
+def prefilter_stats():
+    """How many images the BG pre-filter decided locally vs escalated."""
+    n = prefilter_counts["images"]
+    return {
+        **prefilter_counts,
+        "local_fraction":     round((n - prefilter_counts["escalated"]) / n, 4) if n else 0.0,
+        "escalated_fraction": round(prefilter_counts["escalated"] / n, 4) if n else 0.0,
+    }
+
+@router.get("/ready")
+def ready():
+    """503 until the model is loaded and warmed up; reports cold-start timings."""
+    return JSONResponse(content=lifecycle, status_code=200 if lifecycle["ready"] else 503)
+
+metrics_service.register_stats("batcher", batcher.stats)
+metrics_service.register_stats("verify_cache", verify_cache.stats)
+metrics_service.register_stats("prefilter", prefilter_stats)
+metrics_service.register_stats("result_cache", result_cache.stats)
+metrics_service.register_stats("admission", admission.stats)
+metrics_service.register_stats("model", lambda: {k: v for k, v in lifecycle.items() if k != "backend"})
+
+@router.on_event("startup")
+async def _start_model():
+    executor_service.start()
+    cfg = executor_service.config
+    admission.configure(ADMISSION_LIMIT or 2 * cfg["workers"])
+    # process pool: every worker loads its own model, so prepare each of them
+    n = cfg["workers"] if cfg["kind"] == "process" else 1
+    timings = await asyncio.gather(*[run_cpu(prepare) for _ in range(n)])
+    for key in ("load_s", "warmup_s"):
+        lifecycle[key] = max(t[key] or 0.0 for t in timings)
+    lifecycle["ready"] = True
+    log_event(logging.INFO, "model_ready", load_s=lifecycle["load_s"],
+              warmup_s=lifecycle["warmup_s"])
+
+@router.on_event("shutdown")
+async def _close_plantnet_client():
+    await close_client()
+    executor_service.shutdown()
+
+app.include_router(router)
+
+lifecycle["import_s"] = round(time.perf_counter() - _IMPORT_T0, 3)
\ No newline at end of file
@@ -0,0 +1,48 @@
+"""
+Spray planning from an hourly weather forecast (services/forecast_service.py).
+
+POST /forecastRisk   JSON {"orchards": [{"id", "start", "temperature": [...],
+                                         "humidity": [...], "leaf_wetness": [...],
+                                         "severity_idx"}, ...],
+                           "max_windows": 3, "min_hours": 1, "timeline": false}
+    {"orchards": [{"id", "start", "hours", "risk_codes": "0011222…" (one digit per hour),
+                   "risk_hours": {risk: n}, "recommendations": {risk: id},
+                   "spray_windows": [{"start", "end", "hours", "peak_wetness",
+                                      "recommendation_id"}, ...],
+                   "timeline": [{"start", "end", "hours", "risk",
+                                 "recommendation_id"}, ...]       (with timeline)
+                  }, ...],
+     "compute_ms"}
+
+Recommendation ids are the keys of the GET /recommendations catalog.
+"""
+import asyncio, json, time
+from typing import Any, Dict
+
+from fastapi           import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from services.forecast_service import risk_timeline
+
+router = APIRouter()
+
+def _plan(body: bytes) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    try:
+        req = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+    if not isinstance(req, dict):
+        raise HTTPException(status_code=400, detail="Body must be a JSON object")
+    opts = {k: req.get(k, d) for k, d in (("max_windows", 3), ("min_hours", 1))}
+    if not all(isinstance(v, int) and 0 <= v <= 1000 for v in opts.values()):
+        raise HTTPException(status_code=400, detail="max_windows/min_hours must be integers 0–1000")
+    result = risk_timeline(req.get("orchards"), timeline=bool(req.get("timeline", False)), **opts)
+    result["compute_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return result
+
+@router.post("/forecastRisk")
+async def forecast_risk(request: Request):
+    body = await request.body()
+    # parsing and the numpy pass run off the event loop
+    return JSONResponse(await asyncio.to_thread(_plan, body))
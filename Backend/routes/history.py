@@ -0,0 +1,42 @@
+"""
+Regional outbreak view over stored scans (services/history_service.py).
+
+GET /outbreaks?lat=14.6&lon=121.0&radius_km=10&days=30
+    {"scans", "psi_mean", "severity": {label: n}, "weather_risk": {risk: n},
+     "cells": [{"geohash", "lat", "lon", "scans", "psi_mean"}, ...],
+     "cell_precision", "cell_km", "query_ms"}
+
+Scans are counted exactly within `radius_km`; the window starts at
+midnight UTC `days` ago (rollups are per day).
+"""
+from fastapi import APIRouter, HTTPException, Query
+
+from services                 import metrics_service
+from services.history_service import history, MAX_RADIUS_KM
+
+router = APIRouter()
+
+@router.get("/outbreaks")
+async def outbreaks(
+    lat:       float = Query(..., ge=-90,  le=90),
+    lon:       float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(10.0, gt=0, le=MAX_RADIUS_KM),
+    days:      float = Query(30.0, gt=0, le=3650),
+):
+    if not history.enabled:
+        raise HTTPException(status_code=503, detail="Scan history is disabled (HISTORY_DB)")
+    return await history.region(lat, lon, radius_km, days)
+
+@router.get("/stats/history")
+def history_stats():
+    return history.stats()
+
+metrics_service.register_stats("history", history.stats)
+
+@router.on_event("startup")
+def _start_history():
+    history.start()
+
+@router.on_event("shutdown")
+def _stop_history():
+    history.stop()
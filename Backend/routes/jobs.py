@@ -0,0 +1,84 @@
+"""
+Submit/poll scans for slow or flaky connections.
+
+POST /jobs              same form as /getPrescription; optional
+                        `Idempotency-Key` header. 202 {"job_id", "status", "poll"}
+GET  /jobs/{job_id}     {"job_id", "status": queued|running|done|failed,
+                         "result": <the /getPrescription response>, "error"}
+                        ?wait=N long-polls up to N s (max JOB_MAX_WAIT) for the result
+GET  /stats/jobs        queue counters and jobs per status
+
+Persistence and workers live in services/job_service.py.
+"""
+import logging, os
+from typing import Any, Dict, List
+
+from fastapi           import APIRouter, File, Form, Header, HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+from routes.core              import prescribe, check_options, raw_size
+from services                 import metrics_service
+from services.job_service     import jobs
+from services.log_service     import log_event
+from services.upload_service  import bytes_loader, check_uploads, read_upload
+
+router = APIRouter()
+
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", 30))      # s, cap for ?wait=
+
+async def _run_job(params: Dict[str, Any], images: List[bytes]) -> Any:
+    # inference shares the admission limit as background work, never rejected
+    return await prescribe([bytes_loader(raw) for raw in images], source="job",
+                           bounded=False, **params)
+
+@router.post("/jobs", status_code=202)
+async def submit_job(
+    files:           List[UploadFile] = File(...),
+    humidity:        float           = Form(...),
+    temperature:     float           = Form(...),
+    wetness:         float           = Form(...),
+    lat:             float           = Form(...),
+    lon:             float           = Form(...),
+    verify_first:    bool            = Form(False),
+    verify_mode:     str | None      = Form(None),
+    lang:            str             = Form("both"),
+    compact:         bool            = Form(False),
+    input_format:    str             = Form("image"),
+    idempotency_key: str | None      = Header(None),
+):
+    check_options(verify_mode, lang, input_format)
+    await check_uploads(files, raw_size(input_format))
+
+    params = {"humidity": humidity, "temperature": temperature, "wetness": wetness,
+              "lat": lat, "lon": lon, "verify_first": verify_first,
+              "verify_mode": verify_mode, "lang": lang, "compact": compact,
+              "input_format": input_format}
+    raws = [await read_upload(upload) for upload in files]
+    job_id, created = await jobs.submit(params, raws, idempotency_key)
+    log_event(logging.INFO, "job_submitted", job_id=job_id, images=len(raws), created=created)
+    job = await jobs.get(job_id)
+    return JSONResponse(status_code=202 if created else 200,
+                        content={**job, "poll": f"/jobs/{job_id}"})
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0.0):
+    job = (await jobs.wait(job_id, min(wait, JOB_MAX_WAIT)) if wait > 0
+           else await jobs.get(job_id))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
+
+@router.get("/stats/jobs")
+async def job_stats():
+    """Per-process counters plus jobs per status in the shared store."""
+    return {**jobs.stats(), "by_status": await jobs.store.call(jobs.store.counts)}
+
+metrics_service.register_stats("jobs", jobs.stats)
+
+@router.on_event("startup")
+async def _start_jobs():
+    await jobs.start(_run_job)
+
+@router.on_event("shutdown")
+async def _stop_jobs():
+    await jobs.stop()
@@ -0,0 +1,51 @@
+"""
+Request profiles of /getPrescription (services/profile_service.py).
+Every endpoint needs `X-Admin-Token: $ADMIN_TOKEN`.
+
+GET  /admin/profiling                     {"header", "sample_rate", "profiled", "saved", "keep"}
+POST /admin/profiling?sample_rate=0.05    fraction of requests to profile (0 = off), all workers
+GET  /admin/profiles                      newest first: [{"id", "path", "reason", "started",
+                                          "total_ms", "outcome", "stages_ms", "images",
+                                          "artifacts"}, ...]
+GET  /admin/profiles/{id}/{artifact}      summary.json | cprofile.pstats | cprofile.txt |
+                                          forward.txt | forward.json
+
+A single request is profiled with `X-Profile: 1` (plus the admin token);
+its response then carries `X-Profile-Id`.
+"""
+import asyncio
+
+from fastapi           import APIRouter, Header, Query
+from fastapi.responses import FileResponse
+
+from services                 import metrics_service
+from services.profile_service import profiler, check_admin
+
+router = APIRouter()
+
+@router.get("/admin/profiling")
+def profiling_status(x_admin_token: str | None = Header(None)):
+    check_admin(x_admin_token)
+    return profiler.stats()
+
+@router.post("/admin/profiling")
+def set_profiling(
+    sample_rate:   float      = Query(..., ge=0, le=1),
+    x_admin_token: str | None = Header(None),
+):
+    check_admin(x_admin_token)
+    profiler.set_sample_rate(sample_rate)
+    return profiler.stats()
+
+@router.get("/admin/profiles")
+async def list_profiles(x_admin_token: str | None = Header(None)):
+    check_admin(x_admin_token)
+    return await asyncio.to_thread(profiler.list)
+
+@router.get("/admin/profiles/{profile_id}/{artifact}")
+def download_profile(profile_id: str, artifact: str, x_admin_token: str | None = Header(None)):
+    check_admin(x_admin_token)
+    path, media_type = profiler.artifact(profile_id, artifact)
+    return FileResponse(path, media_type=media_type, filename=f"{profile_id}-{artifact}")
+
+metrics_service.register_stats("profiler", profiler.stats)
@@ -0,0 +1,262 @@
+# score_archive.py
+"""
+Offline re-scoring of an archived leaf-photo collection with the current
+model, without going through HTTP.
+
+    python score_archive.py --root /data/archive --out runs/2025-06
+    python score_archive.py --manifest archive.csv --out runs/2025-06 --format parquet
+
+--root       images under <root>/<tree_id>/…; tree id = first folder level
+             (--tree-depth to use deeper levels, e.g. farm/tree = 2)
+--manifest   CSV with `path,tree_id` and optional per-tree
+             `humidity,temperature,wetness,lat,lon` columns
+--humidity/--temperature/--wetness   weather for trees without their own
+
+Decode workers (process pool) turn photos into 224×224 tensors with the
+same decode_image/TRANSFORM as the API; the main process runs them through
+the model in batches of --batch-size. Per-image rows are appended to
+<out>/images.csv as each batch finishes, which is also the checkpoint:
+re-running the same command skips images already scored. Per-tree PSI,
+overall label and (with weather) the recommendation id are written to
+<out>/trees.csv (and .parquet with --format parquet, needs pyarrow) at the end.
+"""
+import argparse, csv, json, os, sys, time
+from collections        import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing             import Any, Dict, Iterator, List, Tuple
+
+import torch
+
+from routes.core import (CLASS_LABELS, BG_INDEX, decode_image, preprocess, forward_batch,
+                         model_version, severities, summarize, build_response)
+
+IMAGE_EXTS    = (".jpg", ".jpeg", ".png", ".webp")             # what the API accepts
+IMAGE_FIELDS  = ["path", "tree_id", "label", "severity", "p_bg", "logits"]
+TREE_FIELDS   = ["tree_id", "images", "percent_severity_index", "overall_label",
+                 "overall_severity_index", "weather_risk", "recommendation_id",
+                 "humidity", "temperature", "wetness", "lat", "lon", "failed"]
+WEATHER_KEYS  = ("humidity", "temperature", "wetness", "lat", "lon")
+
+# --------------------------------------------------------------------- #
+# inputs                                                                #
+# --------------------------------------------------------------------- #
+def walk_root(root: str, depth: int) -> Iterator[Tuple[str, str]]:
+    for d, dirs, names in os.walk(root):
+        dirs.sort()
+        rel = os.path.relpath(d, root).split(os.sep)
+        if rel == ["."] or len(rel) < depth:
+            continue
+        tree_id = "/".join(rel[:depth])
+        for n in sorted(names):
+            if n.lower().endswith(IMAGE_EXTS):
+                yield os.path.join(d, n), tree_id
+
+def read_manifest(path: str) -> Tuple[List[Tuple[str, str]], Dict[str, Dict[str, float]]]:
+    items, weather = [], {}
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            p = row["path"] if os.path.isabs(row["path"]) else os.path.join(base, row["path"])
+            items.append((p, row["tree_id"]))
+            w = {k: float(row[k]) for k in WEATHER_KEYS if row.get(k) not in (None, "")}
+            if w:
+                weather.setdefault(row["tree_id"], {}).update(w)
+    return items, weather
+
+# --------------------------------------------------------------------- #
+# decode workers                                                        #
+# --------------------------------------------------------------------- #
+def load_tensor(item: Tuple[str, str]) -> Tuple[str, str, torch.Tensor | None, str | None]:
+    path, tree_id = item
+    try:
+        with open(path, "rb") as f:
+            img, _ = decode_image(f.read())
+        return path, tree_id, preprocess([img])[0], None
+    except Exception as e:                          # unreadable file: record, keep going
+        return path, tree_id, None, f"{type(e).__name__}: {e}"
+
+def _init_worker() -> None:
+    torch.set_num_threads(1)
+
+# --------------------------------------------------------------------- #
+# checkpoint                                                            #
+# --------------------------------------------------------------------- #
+def drop_partial_row(path: str) -> None:
+    """Cut what a crash left after the last newline (a half-written row)."""
+    with open(path, "rb+") as f:
+        end = pos = f.seek(0, os.SEEK_END)
+        while pos > 0:
+            step = min(1 << 16, pos)
+            f.seek(pos - step)
+            cut = f.read(step).rfind(b"\n")
+            if cut >= 0:
+                pos += cut + 1 - step
+                break
+            pos -= step
+        if pos != end:
+            f.truncate(pos)
+
+def open_run(out: str, version: str, restart: bool) -> set:
+    """Create/validate <out>/run.json; return paths already in images.csv."""
+    os.makedirs(out, exist_ok=True)
+    meta_path, images_path = os.path.join(out, "run.json"), os.path.join(out, "images.csv")
+    if restart:
+        for p in (meta_path, images_path):
+            if os.path.exists(p):
+                os.remove(p)
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta["model_version"] != version:
+            sys.exit(f"❌ {out} was scored with model {meta['model_version']}, current is "
+                     f"{version}; use a new --out or --restart")
+    else:
+        with open(meta_path, "w") as f:
+            json.dump({"model_version": version, "started": time.strftime("%Y-%m-%dT%H:%M:%S")}, f)
+    done = set()
+    if os.path.exists(images_path):
+        drop_partial_row(images_path)            # that image is simply scored again
+        with open(images_path, newline="") as f:
+            done = {row["path"] for row in csv.DictReader(f)}
+    return done
+
+def bounded_map(pool: ProcessPoolExecutor, fn, items: List, window: int) -> Iterator:
+    """pool.map in order, but with at most `window` results decoded ahead."""
+    pending: deque = deque()
+    it = iter(items)
+    for x in it:
+        pending.append(pool.submit(fn, x))
+        if len(pending) >= window:
+            break
+    while pending:
+        yield pending.popleft().result()
+        nxt = next(it, None)
+        if nxt is not None:
+            pending.append(pool.submit(fn, nxt))
+
+def batched(it: Iterator, n: int) -> Iterator[List]:
+    batch = []
+    for x in it:
+        batch.append(x)
+        if len(batch) == n:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# --------------------------------------------------------------------- #
+# scoring                                                               #
+# --------------------------------------------------------------------- #
+def score_images(todo: List[Tuple[str, str]], images_path: str, args: argparse.Namespace) -> None:
+    new_file = not os.path.exists(images_path) or os.path.getsize(images_path) == 0
+    t0, scored = time.perf_counter(), 0
+    with open(images_path, "a", newline="") as f, \
+         ProcessPoolExecutor(args.workers, initializer=_init_worker) as pool:
+        writer = csv.DictWriter(f, IMAGE_FIELDS)
+        if new_file:
+            writer.writeheader()
+        # bounded read-ahead: decoded tensors never pile up if the model is slower
+        decoded = bounded_map(pool, load_tensor, todo, window=2 * args.batch_size)
+        for batch in batched(decoded, args.batch_size):
+            ok = [b for b in batch if b[2] is not None]
+            logits = forward_batch(torch.stack([b[2] for b in ok])) if ok else torch.empty(0, 5)
+            p_bg = torch.softmax(logits, dim=1)[:, BG_INDEX].tolist() if ok else []
+            sevs = severities(logits) if ok else []
+            for (path, tree_id, _, _), sev, pb, row in zip(ok, sevs, p_bg, logits.tolist()):
+                writer.writerow({"path": path, "tree_id": tree_id, "label": CLASS_LABELS[sev],
+                                 "severity": sev, "p_bg": round(pb, 5),
+                                 "logits": " ".join(f"{v:.5f}" for v in row)})
+            for path, tree_id, _, err in batch:
+                if err is not None:
+                    writer.writerow({"path": path, "tree_id": tree_id, "label": "ERROR",
+                                     "severity": "", "p_bg": "", "logits": err})
+            f.flush()                               # a finished batch survives a crash
+            scored += len(batch)
+            if scored % args.progress_every < len(batch) or scored == len(todo):
+                rate = scored / (time.perf_counter() - t0)
+                eta = (len(todo) - scored) / rate if rate else 0
+                print(f"⏳ {scored}/{len(todo)} images  {rate:.1f} img/s  eta {eta / 60:.1f} min")
+
+def write_trees(images_path: str, out: str, weather: Dict[str, Dict[str, float]],
+                default_weather: Dict[str, float], fmt: str) -> List[Dict[str, Any]]:
+    per_tree: Dict[str, List[int]] = defaultdict(list)
+    failed: Dict[str, int] = defaultdict(int)
+    with open(images_path, newline="") as f:
+        for row in csv.DictReader(f):
+            if row["label"] == "ERROR":
+                failed[row["tree_id"]] += 1
+            else:
+                per_tree[row["tree_id"]].append(int(row["severity"]))
+
+    rows = []
+    for tree_id in sorted(per_tree.keys() | failed.keys()):
+        sevs = per_tree.get(tree_id, [])
+        row: Dict[str, Any] = {"tree_id": tree_id, "images": len(sevs),
+                               "failed": failed.get(tree_id, 0)}
+        if sevs:
+            _, psi, overall, overall_idx = summarize(sevs)
+            row.update(percent_severity_index=psi, overall_label=overall,
+                       overall_severity_index=overall_idx)
+            w = {**default_weather, **weather.get(tree_id, {})}
+            row.update({k: w.get(k) for k in WEATHER_KEYS})
+            if all(k in w for k in ("humidity", "temperature", "wetness")):
+                rec = build_response(psi, overall_idx, w["humidity"], w["temperature"],
+                                     w["wetness"], w.get("lat"), w.get("lon"),
+                                     compact=True)["recommendation"]
+                row.update(weather_risk=rec["weather_risk"], recommendation_id=rec["id"])
+        rows.append(row)
+
+    with open(os.path.join(out, "trees.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, TREE_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    if fmt == "parquet":
+        try:
+            import pyarrow.csv as pa_csv, pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("❌ --format parquet needs pyarrow (pip install pyarrow); CSVs were written")
+        for name in ("images", "trees"):
+            pq.write_table(pa_csv.read_csv(os.path.join(out, f"{name}.csv")),
+                           os.path.join(out, f"{name}.parquet"))
+    return rows
+
+# --------------------------------------------------------------------- #
+# CLI                                                                   #
+# --------------------------------------------------------------------- #
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--root")
+    src.add_argument("--manifest")
+    ap.add_argument("--tree-depth", type=int, default=1)
+    ap.add_argument("--out", required=True)
+    ap.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    ap.add_argument("--batch-size", type=int, default=32)
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                    help="decode processes (the rest of the cores run the model)")
+    ap.add_argument("--restart", action="store_true", help="discard the checkpoint in --out")
+    ap.add_argument("--progress-every", type=int, default=1000)
+    for k in ("humidity", "temperature", "wetness", "lat", "lon"):
+        ap.add_argument(f"--{k}", type=float)
+    args = ap.parse_args()
+
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) - args.workers))
+    if args.root:
+        items, weather = list(walk_root(args.root, args.tree_depth)), {}
+    else:
+        items, weather = read_manifest(args.manifest)
+    version = model_version()
+    done = open_run(args.out, version, args.restart)
+    todo = [it for it in items if it[0] not in done]
+    print(f"🔎 {len(items)} images, {len(done)} already scored, {len(todo)} to go "
+          f"(model {version}, {args.workers} decode workers, batch {args.batch_size})")
+
+    images_path = os.path.join(args.out, "images.csv")
+    if todo:
+        score_images(todo, images_path, args)
+    default_weather = {k: getattr(args, k) for k in WEATHER_KEYS if getattr(args, k) is not None}
+    rows = write_trees(images_path, args.out, weather, default_weather, args.format)
+    print(f"✅ {len(rows)} trees → {os.path.join(args.out, 'trees.csv')}")
+
+if __name__ == "__main__":
+    main()
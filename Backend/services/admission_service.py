@@ -0,0 +1,126 @@
+"""
+SuperMango Admission Control
+============================
+async with admission.slot():              ...   # interactive: may raise 429/503
+async with admission.slot(bounded=False): ...   # jobs / bulk: waits its turn
+
+At most ADMISSION_LIMIT requests run the inference pipeline (decode,
+preprocess, forward) at once; the rest wait in FIFO order, interactive
+callers in one queue and background work (jobs, bulk trees) in another.
+A freed slot goes to the oldest interactive waiter first, so a deep bulk
+upload never sits in front of a phone. An interactive caller is turned
+away at once with 429 when ADMISSION_QUEUE interactive callers are
+already waiting, or with 503 if no slot frees up within ADMISSION_TIMEOUT s. Both carry Retry-After,
+estimated from the recent time per request and the queue ahead. Under a
+burst the box keeps serving ADMISSION_LIMIT requests at full speed
+instead of slowing every request down together.
+
+ADMISSION_LIMIT    concurrent requests (0 = 2 × inference workers)
+ADMISSION_QUEUE    waiting interactive requests before 429 (default 16)
+ADMISSION_TIMEOUT  seconds a request may wait before 503 (default 10)
+"""
+import asyncio, math, os, time
+from collections import deque
+from contextlib  import asynccontextmanager
+from typing      import Any, AsyncIterator, Deque, Dict
+
+from fastapi import HTTPException
+
+from services.metrics_service import REJECTIONS
+
+ADMISSION_LIMIT   = int(os.getenv("ADMISSION_LIMIT", 0))
+ADMISSION_QUEUE   = int(os.getenv("ADMISSION_QUEUE", 16))
+ADMISSION_TIMEOUT = float(os.getenv("ADMISSION_TIMEOUT", 10))
+
+EWMA_ALPHA = 0.2
+
+class AdmissionController:
+    def __init__(self, limit: int, max_queue: int, timeout: float) -> None:
+        self.limit     = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.timeout   = timeout
+        self._active   = 0
+        self._waiters: "Deque[asyncio.Future[None]]" = deque()      # interactive
+        self._background: "Deque[asyncio.Future[None]]" = deque()   # jobs / bulk
+        self._service_s = 1.0                     # EWMA of time holding a slot
+
+        # counters
+        self.admitted          = 0
+        self.queued            = 0
+        self.rejected_full     = 0
+        self.rejected_timeout  = 0
+
+    def configure(self, limit: int) -> None:
+        self.limit = max(1, limit)
+
+    def retry_after(self) -> int:
+        """Seconds until a new caller would likely get a slot."""
+        return max(1, math.ceil(self._service_s * (len(self._waiters) + 1) / self.limit))
+
+    def _reject(self, status: int, reason: str) -> HTTPException:
+        REJECTIONS.labels(reason).inc()
+        return HTTPException(status_code=status, detail=f"Server busy ({reason}), retry later",
+                             headers={"Retry-After": str(self.retry_after())})
+
+    # ---------------------------------------------------------- #
+    # acquire / release                                          #
+    # ---------------------------------------------------------- #
+    async def _acquire(self, bounded: bool) -> None:
+        if self._active < self.limit and not self._waiters and not self._background:
+            self._active += 1
+            return
+        if bounded and len(self._waiters) >= self.max_queue:
+            self.rejected_full += 1
+            raise self._reject(429, "queue_full")
+
+        fut: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        waiters = self._waiters if bounded else self._background
+        waiters.append(fut)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(fut, self.timeout if bounded else None)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                self._release()                   # slot was handed over as we gave up
+            else:
+                waiters.remove(fut)
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected_timeout += 1
+                raise self._reject(503, "queue_timeout")
+            raise
+
+    def _release(self) -> None:
+        for waiters in (self._waiters, self._background):      # interactive first
+            while waiters:
+                fut = waiters.popleft()
+                if not fut.done():
+                    fut.set_result(None)          # hand the slot straight over
+                    return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, bounded: bool = True) -> AsyncIterator[None]:
+        await self._acquire(bounded)
+        self.admitted += 1
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._service_s += EWMA_ALPHA * (time.perf_counter() - t0 - self._service_s)
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit":            self.limit,
+            "max_queue":        self.max_queue,
+            "active":           self._active,
+            "waiting":          len(self._waiters),
+            "waiting_background": len(self._background),
+            "admitted":         self.admitted,
+            "queued":           self.queued,
+            "rejected_full":    self.rejected_full,
+            "rejected_timeout": self.rejected_timeout,
+            "service_s":        round(self._service_s, 3),
+        }
+
+admission = AdmissionController(ADMISSION_LIMIT or 1, ADMISSION_QUEUE, ADMISSION_TIMEOUT)
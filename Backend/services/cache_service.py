@@ -0,0 +1,217 @@
+"""
+SuperMango Content-Addressed Caches
+===================================
+content_key(raw_bytes) -> sha256 hex digest of an upload
+
+LRUCache(maxsize, ttl)        in-memory LRU with per-entry expiry
+VerificationCache(...)        (ok, info) Pl@ntNet verdicts: LRU tier in
+                              front of an optional SQLite tier that
+                              survives restarts. Async API; SQLite work
+                              runs on its own single-thread executor.
+ResultCache(max_mb)           per-image model logits, keyed by upload hash,
+                              input format and model version; sized from a
+                              memory budget.
+"""
+import asyncio, hashlib, os, sqlite3, sys, threading, time
+from collections        import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing             import Any, Dict, Hashable, List, Sequence, Tuple
+
+# -------------------------------------------------------------- #
+# 0. HELPERS                                                     #
+# -------------------------------------------------------------- #
+def content_key(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+# -------------------------------------------------------------- #
+# 1. IN-MEMORY LRU WITH TTL                                      #
+# -------------------------------------------------------------- #
+class LRUCache:
+    """Bounded LRU; entries older than `ttl` seconds count as misses."""
+
+    def __init__(self, maxsize: int, ttl: float | None = None) -> None:
+        self.maxsize = max(0, maxsize)
+        self.ttl     = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock   = threading.Lock()
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            stored_at, value = item
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        """Live entries only; expired ones are purged while counting."""
+        with self._lock:
+            if self.ttl is not None:
+                cutoff = time.time() - self.ttl
+                for key in [k for k, (t, _) in self._data.items() if t < cutoff]:
+                    del self._data[key]
+            return len(self._data)
+
+# -------------------------------------------------------------- #
+# 2. PL@NTNET VERDICT CACHE                                      #
+# -------------------------------------------------------------- #
+TRANSIENT_PREFIXES = ("API_ERROR", "REQUEST_FAILED")
+
+class VerificationCache:
+    def __init__(self, maxsize: int, ttl: float, db_path: str | None = None) -> None:
+        self.ttl    = ttl
+        self.memory = LRUCache(maxsize, ttl)
+        self.db: sqlite3.Connection | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            # one thread owns the connection, so calls are serialized
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="verify-cache")
+            self.db = self._executor.submit(self._open, db_path).result()
+
+        # counters
+        self.hits_memory = 0
+        self.hits_sqlite = 0
+        self.misses      = 0
+        self.stored      = 0
+        self.coalesced   = 0          # lookups that joined an in-flight call
+        self.skipped_transient = 0
+
+    # ---------------------------------------------------------- #
+    # SQLite tier (runs on self._executor)                       #
+    # ---------------------------------------------------------- #
+    @staticmethod
+    def _open(db_path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(db_path, check_same_thread=False)
+        # WAL + NORMAL: no fsync per committed verdict
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            " key TEXT PRIMARY KEY, ok INTEGER, info TEXT, stored_at REAL)"
+        )
+        db.commit()
+        return db
+
+    def _db_get(self, key: str) -> Tuple[bool, str | None] | None:
+        row = self.db.execute(
+            "SELECT ok, info, stored_at FROM verdicts WHERE key = ?", (key,)
+        ).fetchone()
+        if row and time.time() - row[2] <= self.ttl:
+            return bool(row[0]), row[1]
+        return None
+
+    def _db_put(self, key: str, ok: bool, info: str | None) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?)",
+            (key, int(ok), info, time.time()),
+        )
+        self.db.commit()
+
+    async def _on_db(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    # ---------------------------------------------------------- #
+    # public API                                                 #
+    # ---------------------------------------------------------- #
+    async def get(self, key: str) -> Tuple[bool, str | None] | None:
+        verdict = self.memory.get(key)
+        if verdict is not None:
+            self.hits_memory += 1
+            return verdict
+
+        if self.db is not None:
+            verdict = await self._on_db(self._db_get, key)
+            if verdict is not None:
+                self.memory.set(key, verdict)
+                self.hits_sqlite += 1
+                return verdict
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, verdict: Tuple[bool, str | None]) -> None:
+        ok, info = verdict
+        if not ok and info and info.startswith(TRANSIENT_PREFIXES):
+            self.skipped_transient += 1
+            return
+        self.memory.set(key, verdict)
+        if self.db is not None:
+            await self._on_db(self._db_put, key, ok, info)
+        self.stored += 1
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.hits_memory + self.hits_sqlite
+        total = hits + self.misses
+        return {
+            "hits_memory":       self.hits_memory,
+            "hits_sqlite":       self.hits_sqlite,
+            "misses":            self.misses,
+            "hit_rate":          round(hits / total, 4) if total else 0.0,
+            "stored":            self.stored,
+            "coalesced":         self.coalesced,
+            "skipped_transient": self.skipped_transient,
+            "memory_entries":    len(self.memory),
+            "sqlite_enabled":    self.db is not None,
+        }
+
+# -------------------------------------------------------------- #
+# 3. INFERENCE RESULT CACHE                                      #
+# -------------------------------------------------------------- #
+def _entry_bytes(num_outputs: int) -> int:
+    """Footprint of one entry: key str + tuple of floats + LRU bookkeeping."""
+    key    = sys.getsizeof("v" * 80 + ":" + "0" * 64)
+    logits = sys.getsizeof(tuple(range(num_outputs))) + num_outputs * sys.getsizeof(0.0)
+    return key + logits + 200            # OrderedDict node + (time, value) tuple
+
+class ResultCache:
+    """
+    Logits of images already run through the model. Every entry has the
+    same shape, so the memory budget becomes a fixed entry count.
+    """
+
+    def __init__(self, max_mb: float, num_outputs: int, model_version: str) -> None:
+        self.model_version = model_version
+        self.entry_bytes   = _entry_bytes(num_outputs)
+        self.memory = LRUCache(int(max_mb * 2**20) // self.entry_bytes)
+        self.hits   = 0
+        self.misses = 0
+
+    def key(self, raw: bytes, input_format: str = "image") -> str:
+        """The same bytes read as another input format are a different image."""
+        return f"{self.model_version}:{input_format}:{content_key(raw)}"
+
+    def get_many(self, keys: Sequence[str]) -> List[Tuple[float, ...] | None]:
+        found = [self.memory.get(k) for k in keys]
+        hits = sum(f is not None for f in found)
+        self.hits   += hits
+        self.misses += len(found) - hits
+        return found
+
+    def set(self, key: str, logits: Sequence[float]) -> None:
+        self.memory.set(key, tuple(logits))
+
+    def stats(self) -> Dict[str, Any]:
+        total   = self.hits + self.misses
+        entries = len(self.memory)
+        return {
+            "hits":        self.hits,
+            "misses":      self.misses,
+            "hit_rate":    round(self.hits / total, 4) if total else 0.0,
+            "entries":     entries,
+            "max_entries": self.memory.maxsize,
+            "approx_mb":   round(entries * self.entry_bytes / 2**20, 2),
+        }
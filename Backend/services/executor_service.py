@@ -0,0 +1,100 @@
+"""
+SuperMango CPU Executor
+=======================
+await run_cpu(fn, *args)  -> fn(*args) on the inference executor
+                             (under cProfile while the request is profiled)
+
+Image decoding, preprocessing and the ResNet-50 forward pass are CPU-bound;
+running them here keeps the event loop free to accept and read uploads.
+
+WORKERS             server processes (main.py); cores are split between them
+INFERENCE_EXECUTOR  "thread" (default) | "process"
+INFERENCE_WORKERS   pool size            (0 = pick from core count)
+TORCH_THREADS       torch intra-op threads per worker (0 = pick)
+"""
+import asyncio, logging, multiprocessing, os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing             import Any, Callable, Dict
+
+import torch
+
+from services             import profile_service
+from services.log_service import log_event
+
+# -------------------------------------------------------------- #
+# 0. CONFIGURATION                                               #
+# -------------------------------------------------------------- #
+SERVER_WORKERS     = max(1, int(os.getenv("WORKERS", 1)))
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")
+INFERENCE_WORKERS  = int(os.getenv("INFERENCE_WORKERS", 0))
+TORCH_THREADS      = int(os.getenv("TORCH_THREADS", 0))
+
+def pick_defaults(kind: str, cores: int) -> Dict[str, int]:
+    """
+    thread:  forwards are serialized by the batcher, so one forward may use
+             every core; a few extra workers overlap decode with compute.
+    process: one model per worker; cores are split evenly between them.
+    """
+    if kind == "process":
+        workers = INFERENCE_WORKERS or max(1, cores // 2)
+        threads = TORCH_THREADS or max(1, cores // workers)
+    else:
+        workers = INFERENCE_WORKERS or min(4, cores)
+        threads = TORCH_THREADS or cores
+    return {"workers": workers, "torch_threads": threads}
+
+# -------------------------------------------------------------- #
+# 1. EXECUTOR LIFECYCLE                                          #
+# -------------------------------------------------------------- #
+_executor: Executor | None = None
+config:    Dict[str, Any]  = {}
+
+def _init_process_worker(threads: int) -> None:
+    torch.set_num_threads(threads)
+
+def start() -> Executor:
+    """Create the pool (idempotent) and log the settings chosen."""
+    global _executor
+    if _executor is not None:
+        return _executor
+
+    # each server worker gets its share of the machine
+    cores = max(1, (os.cpu_count() or 1) // SERVER_WORKERS)
+    kind  = INFERENCE_EXECUTOR if INFERENCE_EXECUTOR in ("thread", "process") else "thread"
+    picked = pick_defaults(kind, cores)
+    config.update(kind=kind, cores=cores, **picked)
+
+    if kind == "process":
+        _executor = ProcessPoolExecutor(
+            max_workers=picked["workers"],
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_process_worker,
+            initargs=(picked["torch_threads"],),
+        )
+    else:
+        torch.set_num_threads(picked["torch_threads"])
+        _executor = ThreadPoolExecutor(
+            max_workers=picked["workers"], thread_name_prefix="inference"
+        )
+
+    log_event(logging.INFO, "executor_started", **config)
+    return _executor
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+async def run_cpu(fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run `fn(*args)` on the inference executor. In process mode `fn` and its
+    arguments must be picklable (module-level functions, tensors, bytes).
+    """
+    loop = asyncio.get_running_loop()
+    prof = profile_service.current.get()
+    if prof is None:
+        return await loop.run_in_executor(start(), fn, *args)
+    result, stats = await loop.run_in_executor(start(), profile_service.profiled_call, fn, *args)
+    prof.add_stats(stats)
+    return result
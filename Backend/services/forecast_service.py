@@ -0,0 +1,212 @@
+"""
+SuperMango Forecast Risk Timeline
+=================================
+risk_timeline(orchards, max_windows=3, min_hours=1, timeline=False) -> {"orchards": [...]}
+
+The phone's snapshot rules (rule_service._weather_risk) applied to an
+hourly forecast, for any number of orchards at once. Each orchard sends
+
+    {"id", "start": ISO-8601 hour (default: this UTC hour),
+     "temperature": [°C per hour], "humidity": [% RH per hour],
+     "leaf_wetness": [0..1 wet fraction per hour]   (optional),
+     "severity_idx": 0..3 from its last scan        (optional, default 0)}
+
+All series are padded into one (orchards × hours) array. Leaf wetness,
+when not supplied, counts an hour wet at RH ≥ WET_RH; the `wet` input of
+the rules is the wet hours over the trailing WETNESS_WINDOW h (cumulative
+sum, so O(hours)). Risk comes from weather_risk_index in a single call,
+the recommendation id from a severity × risk lookup table, and stretches
+of equal risk from np.diff over the flattened array — no per-hour Python.
+
+For each orchard the result has the hourly classification as `risk_codes`,
+one digit per hour (0 Low, 1 Medium, 2 High), the recommendation id each
+risk maps to at the orchard's severity, and the next `spray_windows`:
+High-risk runs of at least `min_hours`, with the peak rolling wetness
+inside them. With `timeline`, the same hours are also listed as runs
+{"start", "end", "hours", "risk", "recommendation_id"} (large for noisy
+forecasts, so off by default).
+
+FORECAST_MAX_ORCHARDS  orchards per request   (default 1000)
+FORECAST_MAX_HOURS     hours per orchard      (default 672, four weeks)
+"""
+import datetime as dt, os
+from typing import Any, Dict, List
+
+import numpy as np
+from fastapi import HTTPException
+
+from services.rule_service import CLASS_LABELS, RISK_LABELS, recommendation_id, weather_risk_index
+
+# -------------------------------------------------------------- #
+# 0. CONFIGURATION                                               #
+# -------------------------------------------------------------- #
+FORECAST_MAX_ORCHARDS = int(os.getenv("FORECAST_MAX_ORCHARDS", 1000))
+FORECAST_MAX_HOURS    = int(os.getenv("FORECAST_MAX_HOURS", 24 * 28))
+
+WET_RH         = 90.0       # % RH counted as a wet hour when no leaf wetness is given
+WETNESS_WINDOW = 24         # h of wetness summed into the rules' `wet` input
+HIGH           = RISK_LABELS.index("High")
+PAD            = -1         # risk code of padding past an orchard's last hour
+
+# recommendation id per (severity_idx, risk_idx)
+_REC_IDS = np.array([[recommendation_id(sev, risk) for risk in RISK_LABELS]
+                     for sev in range(len(CLASS_LABELS))], dtype=object)
+
+# -------------------------------------------------------------- #
+# 1. INPUT                                                       #
+# -------------------------------------------------------------- #
+def _bad(msg: str) -> HTTPException:
+    return HTTPException(status_code=400, detail=msg)
+
+def _start_hour(value: Any, default: np.datetime64) -> np.datetime64:
+    if value is None:
+        return default
+    try:
+        t = dt.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        raise _bad(f"start must be an ISO-8601 time, got {value!r}")
+    if t.tzinfo is not None:
+        t = t.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    return np.datetime64(t, "h")
+
+def _series(orchard: Dict[str, Any], key: str, i: int) -> np.ndarray:
+    try:
+        arr = np.asarray(orchard[key], dtype=np.float64)   # null -> NaN, as the scalar rules
+    except (TypeError, ValueError):
+        raise _bad(f"orchards[{i}].{key} must be a list of numbers")
+    if arr.ndim != 1:
+        raise _bad(f"orchards[{i}].{key} must be a list of numbers")
+    return arr
+
+def _stack(orchards: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Validate and pad the per-orchard series into (N, H) arrays."""
+    if not isinstance(orchards, list) or not orchards:
+        raise _bad("orchards must be a non-empty list")
+    if len(orchards) > FORECAST_MAX_ORCHARDS:
+        raise _bad(f"At most {FORECAST_MAX_ORCHARDS} orchards per request")
+
+    now = np.datetime64(dt.datetime.now(dt.timezone.utc).replace(tzinfo=None), "h")
+    series, starts, sev = [], [], []
+    for i, o in enumerate(orchards):
+        if not isinstance(o, dict) or "temperature" not in o or "humidity" not in o:
+            raise _bad(f"orchards[{i}] needs temperature and humidity series")
+        temp, rh = _series(o, "temperature", i), _series(o, "humidity", i)
+        wet = _series(o, "leaf_wetness", i) if o.get("leaf_wetness") is not None else None
+        if not 0 < len(temp) <= FORECAST_MAX_HOURS:
+            raise _bad(f"orchards[{i}] needs 1–{FORECAST_MAX_HOURS} hourly values")
+        if len(rh) != len(temp) or (wet is not None and len(wet) != len(temp)):
+            raise _bad(f"orchards[{i}] series must have the same length")
+        s = o.get("severity_idx", 0)
+        if not isinstance(s, int) or isinstance(s, bool) or not 0 <= s < len(CLASS_LABELS):
+            raise _bad(f"orchards[{i}].severity_idx must be 0–{len(CLASS_LABELS) - 1}")
+        series.append((temp, rh, wet))
+        starts.append(_start_hour(o.get("start"), now))
+        sev.append(s)
+
+    n, h = len(series), max(len(t) for t, _, _ in series)
+    temp = np.full((n, h), np.nan)
+    rh   = np.full((n, h), np.nan)
+    wet  = np.zeros((n, h))
+    lengths = np.empty(n, dtype=np.int64)
+    for i, (t, r, w) in enumerate(series):
+        k = lengths[i] = len(t)
+        temp[i, :k], rh[i, :k] = t, r
+        wet[i, :k] = np.clip(np.nan_to_num(w), 0, 1) if w is not None else r >= WET_RH
+    return {"temp": temp, "rh": rh, "wet": wet, "lengths": lengths,
+            "starts": np.array(starts, dtype="datetime64[h]"), "severity": np.array(sev)}
+
+# -------------------------------------------------------------- #
+# 2. VECTORIZED EVALUATION                                       #
+# -------------------------------------------------------------- #
+def rolling_wetness(wet: np.ndarray, window: int = WETNESS_WINDOW) -> np.ndarray:
+    """Wet hours over the trailing `window` hours, per row (shorter at the start)."""
+    cs = np.cumsum(wet, axis=1)
+    out = cs.copy()
+    out[:, window:] -= cs[:, :-window]
+    return out
+
+def evaluate(data: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Risk per orchard-hour and its runs. Returns flat arrays, one entry per
+    run of equal risk: row, first hour, length, risk index, peak wetness.
+    """
+    wet24 = rolling_wetness(data["wet"])
+    risk  = weather_risk_index(data["temp"], data["rh"], wet24)
+    n, h  = risk.shape
+    risk[np.arange(h) >= data["lengths"][:, None]] = PAD
+
+    flat  = risk.ravel()
+    edge  = np.empty(flat.size, dtype=bool)
+    edge[0] = True
+    np.not_equal(flat[1:], flat[:-1], out=edge[1:])
+    edge[::h] = True                                  # every row starts a run
+    first = np.flatnonzero(edge)
+    size  = np.diff(np.append(first, flat.size))
+    peak  = np.maximum.reduceat(wet24.ravel(), first)
+
+    keep = flat[first] != PAD
+    return {"risk": risk, "row": first[keep] // h, "hour": first[keep] % h,
+            "hours": size[keep], "run_risk": flat[first][keep], "peak": peak[keep]}
+
+# -------------------------------------------------------------- #
+# 3. RESPONSE                                                    #
+# -------------------------------------------------------------- #
+def _iso(times: np.ndarray) -> List[str]:
+    return [t + ":00Z" for t in np.datetime_as_string(times, unit="h").tolist()]
+
+def _run_fields(data: Dict[str, np.ndarray], runs: Dict[str, np.ndarray],
+                idx: np.ndarray) -> Dict[str, list]:
+    """Timestamps, lengths, risk and recommendation ids of the runs `idx`."""
+    row, hours, rk = runs["row"][idx], runs["hours"][idx], runs["run_risk"][idx]
+    t0 = data["starts"][row] + runs["hour"][idx].astype("timedelta64[h]")
+    return {"start": _iso(t0), "end": _iso(t0 + hours.astype("timedelta64[h]")),
+            "hours": hours.tolist(), "risk": rk.tolist(),
+            "recommendation_id": _REC_IDS[data["severity"][row], rk].tolist()}
+
+def risk_timeline(orchards: List[Dict[str, Any]], max_windows: int = 3,
+                  min_hours: int = 1, timeline: bool = False) -> Dict[str, Any]:
+    data = _stack(orchards)
+    runs = evaluate(data)
+    row, rows = runs["row"], np.arange(len(orchards) + 1)
+
+    # the first `max_windows` long-enough High runs of each orchard
+    spray = np.flatnonzero((runs["run_risk"] == HIGH) & (runs["hours"] >= min_hours))
+    rank  = np.arange(spray.size) - np.searchsorted(row[spray], row[spray])
+    spray = spray[rank < max_windows]
+    sw    = _run_fields(data, runs, spray)
+    windows = [{"start": s, "end": e, "hours": h, "peak_wetness": round(p, 1),
+                "recommendation_id": rid}
+               for s, e, h, p, rid in zip(sw["start"], sw["end"], sw["hours"],
+                                          runs["peak"][spray].tolist(), sw["recommendation_id"])]
+    wbound = np.searchsorted(row[spray], rows).tolist()
+
+    # only runs that are returned get formatted
+    if timeline:
+        tl = _run_fields(data, runs, np.arange(row.size))
+        segments = [{"start": s, "end": e, "hours": h, "risk": RISK_LABELS[r],
+                     "recommendation_id": rid}
+                    for s, e, h, r, rid in zip(tl["start"], tl["end"], tl["hours"],
+                                               tl["risk"], tl["recommendation_id"])]
+        tbound = np.searchsorted(row, rows).tolist()
+
+    codes  = (runs["risk"] + ord("0")).astype(np.uint8)          # one ASCII digit per hour
+    counts = np.stack([(runs["risk"] == r).sum(axis=1) for r in range(len(RISK_LABELS))],
+                      axis=1).tolist()
+    starts  = _iso(data["starts"])
+    rec_ids = _REC_IDS[data["severity"]].tolist()
+    out = []
+    for i, o in enumerate(orchards):
+        n_hours = int(data["lengths"][i])
+        item: Dict[str, Any] = {
+            "id":            o.get("id", i),
+            "start":         starts[i],
+            "hours":         n_hours,
+            "risk_codes":    codes[i, :n_hours].tobytes().decode("ascii"),
+            "risk_hours":    dict(zip(RISK_LABELS, counts[i])),
+            "recommendations": dict(zip(RISK_LABELS, rec_ids[i])),
+            "spray_windows": windows[wbound[i]:wbound[i + 1]],
+        }
+        if timeline:
+            item["timeline"] = segments[tbound[i]:tbound[i + 1]]
+        out.append(item)
+    return {"orchards": out}
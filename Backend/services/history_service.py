@@ -0,0 +1,412 @@
+"""
+SuperMango Scan History
+=======================
+history.record(lat, lon, severities, psi, overall_idx, risk, weather, source)
+await history.region(lat, lon, radius_km, days)  -> PSI / severity / risk mix + map cells
+
+Every successful scan is appended to SQLite (`scans`, never updated).
+Alongside, each scan bumps one row per geohash precision in `cell_day`:
+(cell, day) -> scan count, PSI sum, severity and risk histograms. A
+regional query covers the circle with geohash cells at the finest
+precision that needs at most MAX_QUERY_CELLS of them, splitting the cells
+on its rim into finer ones. Cells wholly inside the circle are summed
+from their rollup rows; only the finest rim cells are read scan by scan
+(geohash-prefix range on `scans_geo`) and filtered by distance. Cost grows with the area and its rim, not with
+the number of scans stored.
+
+Writes are queued and committed in batches by one writer thread, so
+recording never waits on the disk.
+
+HISTORY_DB     SQLite file (default data/history.sqlite3; "" disables)
+HISTORY_QUEUE  scans waiting for the writer before new ones are dropped (default 10000)
+"""
+import asyncio, logging, math, os, queue, sqlite3, threading, time
+from collections import Counter
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from services.log_service import log_event
+
+# -------------------------------------------------------------- #
+# 0. CONFIGURATION                                               #
+# -------------------------------------------------------------- #
+HISTORY_DB    = os.getenv("HISTORY_DB", os.path.join("data", "history.sqlite3"))
+HISTORY_QUEUE = int(os.getenv("HISTORY_QUEUE", 10000))
+
+ROLLUP_PRECISIONS = (4, 5, 6)        # ~39×20 km, ~4.9×4.9 km, ~1.2×0.6 km cells
+MAX_QUERY_CELLS   = 600
+MAX_RADIUS_KM     = 500.0
+WRITE_BATCH       = 500
+SEVERITY_COLUMNS  = ("sev_healthy", "sev_mild", "sev_moderate", "sev_severe")
+RISK_COLUMNS      = {"Low": "risk_low", "Medium": "risk_medium", "High": "risk_high"}
+EARTH_RADIUS_KM   = 6371.0
+
+# -------------------------------------------------------------- #
+# 1. GEOHASH                                                     #
+# -------------------------------------------------------------- #
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash(lat: float, lon: float, precision: int) -> str:
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    out, bits, ch, even = [], 0, 0, True
+    while len(out) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            ch = ch << 1 | (lon >= mid)
+            lon_lo, lon_hi = (mid, lon_hi) if lon >= mid else (lon_lo, mid)
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            ch = ch << 1 | (lat >= mid)
+            lat_lo, lat_hi = (mid, lat_hi) if lat >= mid else (lat_lo, mid)
+        even = not even
+        bits += 1
+        if bits == 5:
+            out.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(out)
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(lat degrees, lon degrees) of one cell."""
+    lon_bits = math.ceil(5 * precision / 2)
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+def cell_center(gh: str) -> Tuple[float, float]:
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    even = True
+    for c in gh:
+        v = _BASE32.index(c)
+        for shift in range(4, -1, -1):
+            bit = v >> shift & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                lon_lo, lon_hi = (mid, lon_hi) if bit else (lon_lo, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+            even = not even
+    return (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+
+def _haversine_np(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    p1, p2 = math.radians(lat), np.radians(lats)
+    a = (np.sin((p2 - p1) / 2) ** 2
+         + math.cos(p1) * np.cos(p2) * np.sin(np.radians(lons - lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def _classify(lat: float, lon: float, radius_km: float, boxes: np.ndarray) -> np.ndarray:
+    """Per (s, n, w, e) box: 0 outside, 1 cut by the circle, 2 wholly inside."""
+    s, n, w, e = boxes.T
+    nearest = _haversine_np(lat, lon, np.clip(lat, s, n), np.clip(lon, w, e))
+    farthest = np.max([_haversine_np(lat, lon, y, x) for y in (s, n) for x in (w, e)], axis=0)
+    return np.where(nearest > radius_km, 0, np.where(farthest <= radius_km, 2, 1))
+
+def _child_layout(precision: int) -> Tuple[int, int, np.ndarray, np.ndarray]:
+    """How the 32 children of a `precision` cell tile it: (rows, cols, row idx, col idx)."""
+    lon_first = (5 * precision) % 2 == 0
+    v = np.arange(32)
+    odd  = ((v >> 3) & 1) << 1 | ((v >> 1) & 1)                        # bits 3, 1
+    even = ((v >> 4) & 1) << 2 | ((v >> 2) & 1) << 1 | (v & 1)         # bits 4, 2, 0
+    return (4, 8, odd, even) if lon_first else (8, 4, even, odd)
+
+def _base_cells(lat: float, lon: float, radius_km: float,
+                precision: int) -> Tuple[List[str], np.ndarray]:
+    """Cells of the circle's bounding box: (geohashes, (s, n, w, e) boxes)."""
+    dlat, dlon = cell_size(precision)
+    rlat = radius_km / 111.32
+    rlon = radius_km / max(1e-6, 111.32 * math.cos(math.radians(lat)))
+    ys = np.arange(math.floor((max(-90.0, lat - rlat) + 90) / dlat),
+                   math.floor((min(90.0, lat + rlat) + 90) / dlat) + 1)
+    xs = np.arange(math.floor((lon - rlon + 180) / dlon), math.floor((lon + rlon + 180) / dlon) + 1)
+    yy, xx = [g.ravel() for g in np.meshgrid(ys, xs, indexing="ij")]
+    s, w = -90 + yy * dlat, -180 + xx * dlon
+    boxes = np.stack([s, s + dlat, w, w + dlon], axis=1)
+    return [geohash(a + dlat / 2, (b + dlon / 2 + 180) % 360 - 180, precision)
+            for a, b in zip(s, w)], boxes
+
+def covering_cells(lat: float, lon: float,
+                   radius_km: float) -> Tuple[int, Dict[int, List[str]], List[str]]:
+    """
+    -> (base precision, {precision: cells wholly inside}, cells on the rim).
+    The base is the finest precision needing at most MAX_QUERY_CELLS cells;
+    rim cells are then split into finer rollup cells while the rim stays
+    within that budget, so little is left to read scan by scan.
+    """
+    for base in sorted(ROLLUP_PRECISIONS, reverse=True):
+        dlat, dlon = cell_size(base)
+        n_est = (2 * radius_km / (dlat * 111.32) + 1) * \
+                (2 * radius_km / (dlon * 111.32 * max(.01, math.cos(math.radians(lat)))) + 1)
+        coarsest = base == min(ROLLUP_PRECISIONS)
+        if n_est > MAX_QUERY_CELLS * 1.5 and not coarsest:
+            continue
+        cells, boxes = _base_cells(lat, lon, radius_km, base)
+        kind = _classify(lat, lon, radius_km, boxes)
+        if np.count_nonzero(kind) <= MAX_QUERY_CELLS or coarsest:
+            break
+
+    inside = {base: [c for c, k in zip(cells, kind) if k == 2]}
+    edge, edge_boxes = [c for c, k in zip(cells, kind) if k == 1], boxes[kind == 1]
+    precision = base
+    while edge and precision < max(ROLLUP_PRECISIONS):
+        rows, cols, ri, ci = _child_layout(precision)
+        s, n, w, e = (edge_boxes[:, i:i + 1] for i in range(4))
+        h, wd = (n - s) / rows, (e - w) / cols
+        child_boxes = np.stack([s + ri * h, s + (ri + 1) * h, w + ci * wd, w + (ci + 1) * wd],
+                               axis=-1).reshape(-1, 4)
+        child_kind = _classify(lat, lon, radius_km, child_boxes)
+        children = [gh + ch for gh in edge for ch in _BASE32]
+        if np.count_nonzero(child_kind == 1) > MAX_QUERY_CELLS:
+            break
+        precision += 1
+        inside[precision] = [c for c, k in zip(children, child_kind) if k == 2]
+        edge = [c for c, k in zip(children, child_kind) if k == 1]
+        edge_boxes = child_boxes[child_kind == 1]
+    return base, inside, edge
+
+# -------------------------------------------------------------- #
+# 2. STORE                                                       #
+# -------------------------------------------------------------- #
+def _number(value: Any, lo: float = -math.inf, hi: float = math.inf) -> float | None:
+    """float(value) if it is a finite number within [lo, hi], else None."""
+    try:
+        x = float(value)
+    except (TypeError, ValueError):
+        return None
+    return x if math.isfinite(x) and lo <= x <= hi else None
+
+class ScanHistory:
+    def __init__(self, db_path: str | None, max_queue: int = HISTORY_QUEUE) -> None:
+        self.db_path = db_path
+        self._queue: "queue.Queue[Tuple | None]" = queue.Queue(max(1, max_queue))
+        self._writer: threading.Thread | None = None
+        self._read_local = threading.local()
+
+        # counters (this process)
+        self.recorded = 0
+        self.written  = 0
+        self.dropped  = 0                        # write errors and bad rows
+        self.overflow = 0                        # queue full
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.db_path)
+
+    # ---------------------------------------------------------- #
+    # connections                                                #
+    # ---------------------------------------------------------- #
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        db = sqlite3.connect(self.db_path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _schema(self, db: sqlite3.Connection) -> None:
+        hist = ", ".join(f"{c} INTEGER NOT NULL DEFAULT 0"
+                         for c in (*SEVERITY_COLUMNS, *RISK_COLUMNS.values()))
+        db.executescript(
+            "CREATE TABLE IF NOT EXISTS scans ("
+            " id INTEGER PRIMARY KEY, ts REAL NOT NULL, lat REAL, lon REAL, geohash TEXT,"
+            " psi REAL NOT NULL, overall_idx INTEGER NOT NULL, risk TEXT NOT NULL,"
+            " humidity REAL, temperature REAL, wetness REAL,"
+            " severities TEXT NOT NULL, source TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS scans_ts ON scans (ts);"
+            # covering: rim cells are answered from the index alone
+            "CREATE INDEX IF NOT EXISTS scans_geo"
+            " ON scans (geohash, ts, lat, lon, psi, risk, severities);"
+            "CREATE TABLE IF NOT EXISTS cell_day ("
+            " precision INTEGER NOT NULL, cell TEXT NOT NULL, day INTEGER NOT NULL,"
+            f" scans INTEGER NOT NULL DEFAULT 0, psi_sum REAL NOT NULL DEFAULT 0, {hist},"
+            " PRIMARY KEY (precision, cell, day)) WITHOUT ROWID;"
+        )
+
+    def start(self) -> None:
+        if not self.enabled or self._writer is not None:
+            return
+        db = self._connect()
+        self._schema(db)
+        db.close()
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer",
+                                        daemon=True)
+        self._writer.start()
+        log_event(logging.INFO, "history_started", db=self.db_path)
+
+    def stop(self) -> None:
+        if self._writer is not None:
+            try:
+                self._queue.put(None, timeout=120)   # flush what is queued, then exit
+            except queue.Full:
+                pass
+            self._writer.join(timeout=120)
+            self._writer = None
+
+    # ---------------------------------------------------------- #
+    # writes                                                     #
+    # ---------------------------------------------------------- #
+    def record(self, lat: float | None, lon: float | None, severities: Sequence[int],
+               psi: float, overall_idx: int, risk: str, weather: Dict[str, float],
+               source: str = "scan") -> None:
+        """Queue one scan; never blocks the caller (dropped if the queue is full)."""
+        if self._writer is None:
+            return
+        self.recorded += 1
+        lat, lon = _number(lat, -90, 90), _number(lon, -180, 180)
+        if lat is None or lon is None:
+            lat = lon = None                     # kept, but not on the map
+        try:
+            self._queue.put_nowait((time.time(), lat, lon, list(severities), psi, overall_idx,
+                                    risk, _number(weather.get("humidity")),
+                                    _number(weather.get("temperature")),
+                                    _number(weather.get("wetness")), source))
+        except queue.Full:
+            self.overflow += 1
+
+    def _write_loop(self) -> None:
+        db = self._connect()
+        sev_cols  = ", ".join(SEVERITY_COLUMNS)
+        risk_cols = ", ".join(RISK_COLUMNS.values())
+        upsert = (
+            f"INSERT INTO cell_day (precision, cell, day, scans, psi_sum, {sev_cols}, {risk_cols})"
+            f" VALUES (?, ?, ?, 1, ?, {', '.join('?' * (len(SEVERITY_COLUMNS) + len(RISK_COLUMNS)))})"
+            " ON CONFLICT (precision, cell, day) DO UPDATE SET"
+            " scans = scans + 1, psi_sum = psi_sum + excluded.psi_sum, "
+            + ", ".join(f"{c} = {c} + excluded.{c}"
+                        for c in (*SEVERITY_COLUMNS, *RISK_COLUMNS.values()))
+        )
+        done = False
+        while not done:
+            batch = [self._queue.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                done = True
+                batch = [b for b in batch if b is not None]
+            if not batch:
+                continue
+            rows = []
+            for ts, lat, lon, sevs, psi, overall_idx, risk, rh, t, wet, source in batch:
+                try:                             # one bad row must not cost the batch
+                    gh = geohash(lat, lon, max(ROLLUP_PRECISIONS)) if lat is not None \
+                        and lon is not None else None
+                    scan = (ts, lat, lon, gh, psi, overall_idx, risk, rh, t, wet,
+                            ",".join(map(str, sevs)), source)
+                    sev_hist  = [sevs.count(i) for i in range(len(SEVERITY_COLUMNS))]
+                    risk_hist = [int(risk == r) for r in RISK_COLUMNS]
+                    rollups = [] if gh is None else [
+                        (p, gh[:p], int(ts // 86400), psi, *sev_hist, *risk_hist)
+                        for p in ROLLUP_PRECISIONS]
+                    rows.append((scan, rollups))
+                except Exception as e:
+                    self.dropped += 1
+                    log_event(logging.WARNING, "history_bad_row", error=str(e))
+            try:
+                with db:
+                    for scan, rollups in rows:
+                        db.execute(
+                            "INSERT INTO scans (ts, lat, lon, geohash, psi, overall_idx, risk,"
+                            " humidity, temperature, wetness, severities, source)"
+                            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", scan)
+                        db.executemany(upsert, rollups)
+                self.written += len(rows)
+            except Exception as e:               # the writer thread must never die
+                self.dropped += len(rows)
+                log_event(logging.WARNING, "history_write_failed", error=str(e), rows=len(rows))
+        db.close()
+
+    # ---------------------------------------------------------- #
+    # regional query                                             #
+    # ---------------------------------------------------------- #
+    def _reader(self) -> sqlite3.Connection:
+        db = getattr(self._read_local, "db", None)
+        if db is None:
+            db = self._read_local.db = self._connect()
+        return db
+
+    def _region(self, lat: float, lon: float, radius_km: float, days: float) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        db = self._reader()
+        precision, inside, edge = covering_cells(lat, lon, radius_km)
+        since_day = int((time.time() - days * 86400) // 86400)
+        hist = (*SEVERITY_COLUMNS, *RISK_COLUMNS.values())
+        per_cell: Dict[str, List[float]] = {}     # map cells at the base precision
+
+        def add(cell: str, sums: Sequence[float]) -> None:
+            acc = per_cell.setdefault(cell[:precision], [0.0] * (2 + len(hist)))
+            for i, v in enumerate(sums):
+                acc[i] += v
+
+        # cells wholly inside the circle: per-day rollups
+        cols = ", ".join(f"SUM({c})" for c in ("scans", "psi_sum", *hist))
+        for p, cells in inside.items():
+            if not cells:
+                continue
+            for cell, *sums in db.execute(
+                f"SELECT cell, {cols} FROM cell_day"
+                f" WHERE precision = ? AND cell IN ({', '.join('?' * len(cells))}) AND day >= ?"
+                " GROUP BY cell",
+                (p, *cells, since_day),
+            ):
+                add(cell, sums)
+
+        # cells cut by the circle: their raw scans, filtered by distance
+        for cell in edge:
+            rows = db.execute(
+                "SELECT lat, lon, psi, risk, severities FROM scans"
+                " WHERE geohash >= ? AND geohash < ? AND ts >= ?",
+                (cell, cell + "~", since_day * 86400.0),
+            ).fetchall()
+            if not rows:
+                continue
+            lats, lons, psis, risks, sevs = zip(*rows)
+            keep = _haversine_np(lat, lon, np.array(lats), np.array(lons)) <= radius_km
+            if not keep.any():
+                continue
+            kept_sevs = ",".join(v for v, k in zip(sevs, keep) if k)
+            kept_risk = Counter(r for r, k in zip(risks, keep) if k)
+            add(cell, [int(keep.sum()), float(np.array(psis)[keep].sum()),
+                       *(kept_sevs.count(str(i)) for i in range(len(SEVERITY_COLUMNS))),
+                       *(kept_risk[r] for r in RISK_COLUMNS)])
+
+        total = [0.0] * (2 + len(hist))
+        map_cells = []
+        for cell, sums in per_cell.items():
+            total = [a + b for a, b in zip(total, sums)]
+            c_lat, c_lon = cell_center(cell)
+            map_cells.append({"geohash": cell, "lat": round(c_lat, 5), "lon": round(c_lon, 5),
+                              "scans": int(sums[0]), "psi_mean": round(sums[1] / sums[0], 2)})
+        n_scans, psi_sum, *counts = total
+        dlat, dlon = cell_size(precision)
+        return {
+            "center":         {"lat": lat, "lon": lon},
+            "radius_km":      radius_km,
+            "days":           days,
+            "scans":          int(n_scans),
+            "psi_mean":       round(psi_sum / n_scans, 2) if n_scans else None,
+            "severity":       dict(zip(("Healthy", "Mild", "Moderate", "Severe"),
+                                       map(int, counts[:len(SEVERITY_COLUMNS)]))),
+            "weather_risk":   dict(zip(RISK_COLUMNS, map(int, counts[len(SEVERITY_COLUMNS):]))),
+            "cells":          map_cells,
+            "cell_precision": precision,
+            "cell_km":        [round(dlat * 111.32, 2),
+                               round(dlon * 111.32 * math.cos(math.radians(lat)), 2)],
+            "query_ms":       round((time.perf_counter() - t0) * 1000, 2),
+        }
+
+    async def region(self, lat: float, lon: float, radius_km: float,
+                     days: float) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._region, lat, lon, radius_km, days)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled":  self.enabled,
+            "recorded": self.recorded,
+            "written":  self.written,
+            "dropped":  self.dropped,
+            "overflow": self.overflow,
+            "pending":  self._queue.qsize(),
+        }
+
+history = ScanHistory(HISTORY_DB or None)
@@ -0,0 +1,150 @@
+"""
+SuperMango Cross-Request Micro-Batcher
+======================================
+InferenceBatcher(forward, num_outputs, max_batch, max_wait_ms, run=None).submit(tensors) -> logits
+
+Preprocessed image tensors from every in-flight request are queued and
+flushed through `forward` as one batch once either `max_batch` images are
+waiting or the oldest one has waited `max_wait_ms`. Each caller gets back
+exactly the logit rows of the images it submitted. `forward` runs off the
+event loop (via `run`, default `asyncio.to_thread`), so uploads keep being
+accepted and queued while a batch computes. A batch holding images of a
+profiled request (services/profile_service.py) runs under torch.profiler.
+
+stats() -> {
+  "queue_depth": 0,
+  "batches": 12,
+  "images": 31,
+  "batch_size_histogram": {"1": 4, "3": 8},
+  "wait_ms": {"count": 31, "avg": 2.4, "max": 5.1}
+}
+"""
+import asyncio, contextvars, time
+from collections import Counter
+from typing      import Any, Awaitable, Callable, Dict, List, Tuple
+
+import torch
+
+from services import profile_service
+
+_Item = Tuple[torch.Tensor, asyncio.Future, float, "profile_service.RequestProfile | None"]
+                                                        # (image, future, enqueued_at, profile)
+
+class InferenceBatcher:
+    def __init__(
+        self,
+        forward:     Callable[[torch.Tensor], torch.Tensor],
+        num_outputs: int,
+        max_batch:   int,
+        max_wait_ms: float,
+        run:         Callable[..., Awaitable[Any]] | None = None,
+    ) -> None:
+        self.forward     = forward
+        self.num_outputs = num_outputs
+        self.max_batch   = max(1, max_batch)
+        self.max_wait    = max(0.0, max_wait_ms) / 1000
+        self.run         = run or asyncio.to_thread
+        self._queue: asyncio.Queue | None = None
+        self._task:  asyncio.Task  | None = None
+        self._loop:  asyncio.AbstractEventLoop | None = None
+
+        # counters
+        self._batches   = 0
+        self._images    = 0
+        self._sizes     = Counter()
+        self._wait_sum  = 0.0
+        self._wait_max  = 0.0
+
+    # ---------------------------------------------------------- #
+    # public API                                                 #
+    # ---------------------------------------------------------- #
+    async def submit(self, tensors: torch.Tensor) -> torch.Tensor:
+        """Queue a (k, C, H, W) tensor; resolve to its (k, outputs) logits."""
+        if len(tensors) == 0:
+            return torch.empty((0, self.num_outputs))
+        self._ensure_worker()
+        loop = asyncio.get_running_loop()
+        now  = time.perf_counter()
+        prof = profile_service.current.get()
+        futs = []
+        for t in tensors:
+            fut = loop.create_future()
+            self._queue.put_nowait((t, fut, now, prof))
+            futs.append(fut)
+        rows = await asyncio.gather(*futs)
+        return torch.stack(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_batch":   self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches":     self._batches,
+            "images":      self._images,
+            "batch_size_histogram": {str(k): v for k, v in sorted(self._sizes.items())},
+            "wait_ms": {
+                "count": self._images,
+                "avg":   round(self._wait_sum / self._images * 1000, 3) if self._images else 0.0,
+                "max":   round(self._wait_max * 1000, 3),
+            },
+        }
+
+    # ---------------------------------------------------------- #
+    # worker                                                     #
+    # ---------------------------------------------------------- #
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop  = loop
+            self._queue = asyncio.Queue()
+            # own empty context: the worker must not inherit the first
+            # caller's contextvars (e.g. its request profile)
+            self._task  = loop.create_task(self._run(), context=contextvars.Context())
+
+    async def _collect(self) -> List[_Item]:
+        first = await self._queue.get()
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                # drain whatever is already queued without waiting
+                while len(batch) < self.max_batch and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            started = time.perf_counter()
+            for _, _, t0, _ in batch:
+                wait = started - t0
+                self._wait_sum += wait
+                self._wait_max  = max(self._wait_max, wait)
+            self._batches += 1
+            self._images  += len(batch)
+            self._sizes[len(batch)] += 1
+
+            stacked = torch.stack([t for t, _, _, _ in batch])
+            profs   = Counter(p for *_, p in batch if p is not None)
+            try:
+                if profs:
+                    logits, report = await self.run(profile_service.traced_call,
+                                                    self.forward, stacked)
+                    for p, own in profs.items():
+                        p.add_forward(report, len(batch), own)
+                else:
+                    logits = await self.run(self.forward, stacked)
+            except Exception as e:
+                for _, fut, _, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            for row, (_, fut, _, _) in zip(logits, batch):
+                if not fut.done():
+                    fut.set_result(row)
@@ -0,0 +1,378 @@
+"""
+SuperMango Scan Jobs
+====================
+job_id = await jobs.submit(params, [img_bytes…], idempotency_key=None)
+await jobs.get(job_id)                 -> {"job_id", "status", "result"?, "error"?} | None
+await jobs.wait(job_id, timeout)       -> same, once finished or after `timeout` s
+jobs.start(handler) / await jobs.stop()
+
+Submit/poll for slow scans: the upload (parameters + image bytes) is
+written to SQLite and the caller gets a job id at once; JOB_WORKERS
+asyncio workers pull queued jobs and run `handler(params, images)`, whose
+return value is stored as the job result. A claimed job records its
+owner (this process) and the owner refreshes `updated` while the job runs;
+a running job whose lease (JOB_LEASE s) has lapsed was left by a crashed
+process and is queued again, up to JOB_MAX_ATTEMPTS times. Jobs of a live
+sibling process are never taken over; a clean shutdown hands its running
+jobs back at once.
+
+An idempotency key (client-chosen) maps a retried submit to the job it
+already created, so a dropped connection never re-uploads a batch twice.
+Image bytes are dropped once a job finishes; results are kept JOB_TTL s.
+
+JOB_DB            SQLite file (default data/jobs.sqlite3)
+JOB_WORKERS       concurrent jobs per server process (default 2)
+JOB_TTL           seconds finished jobs are kept (default 1 day)
+JOB_MAX_ATTEMPTS  runs per job before it is marked failed (default 3)
+JOB_LEASE         seconds without a heartbeat before a running job is recovered (default 60)
+"""
+import asyncio, json, logging, os, socket, sqlite3, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing             import Any, Awaitable, Callable, Dict, List, Tuple
+
+from services.log_service import log_event
+
+# -------------------------------------------------------------- #
+# 0. CONFIGURATION                                               #
+# -------------------------------------------------------------- #
+JOB_DB           = os.getenv("JOB_DB", os.path.join("data", "jobs.sqlite3"))
+JOB_WORKERS      = int(os.getenv("JOB_WORKERS", 2))
+JOB_TTL          = float(os.getenv("JOB_TTL", 24 * 3600))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+JOB_LEASE        = float(os.getenv("JOB_LEASE", 60))
+
+POLL_INTERVAL    = 1.0        # s; idle workers / waiters also re-check the DB
+                              # (another server process may own the job)
+Handler = Callable[[Dict[str, Any], List[bytes]], Awaitable[Any]]
+
+# -------------------------------------------------------------- #
+# 1. STORE                                                       #
+# -------------------------------------------------------------- #
+class JobStore:
+    """
+    SQLite persistence. Every call runs on one dedicated thread that owns
+    the connection; BEGIN IMMEDIATE makes claiming a job atomic across
+    server processes sharing the file.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs-db")
+        self.db = self._executor.submit(self._open, db_path).result()
+
+    @staticmethod
+    def _open(db_path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None,
+                             timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, idem_key TEXT UNIQUE, status TEXT NOT NULL,"
+            " params TEXT NOT NULL, result TEXT, error TEXT, attempts INTEGER DEFAULT 0,"
+            " created REAL NOT NULL, updated REAL NOT NULL, owner TEXT);"
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);"
+            "CREATE TABLE IF NOT EXISTS job_images ("
+            " job_id TEXT NOT NULL, idx INTEGER NOT NULL, data BLOB NOT NULL,"
+            " PRIMARY KEY (job_id, idx));"
+        )
+        if "owner" not in {r[1] for r in db.execute("PRAGMA table_info(jobs)")}:
+            db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")     # older files
+        return db
+
+    async def call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def close(self) -> None:
+        self._executor.submit(self.db.close).result()
+        self._executor.shutdown(wait=True)
+
+    # ---------------------------------------------------------- #
+    # statements (run on the DB thread)                          #
+    # ---------------------------------------------------------- #
+    def insert(self, params: Dict[str, Any], images: List[bytes],
+               idem_key: str | None) -> Tuple[str, bool]:
+        """-> (job_id, created). An existing idempotency key returns its job."""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            if idem_key is not None:
+                row = self.db.execute("SELECT id FROM jobs WHERE idem_key = ?",
+                                      (idem_key,)).fetchone()
+                if row:
+                    self.db.execute("COMMIT")
+                    return row[0], False
+            self.db.execute(
+                "INSERT INTO jobs (id, idem_key, status, params, created, updated)"
+                " VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, idem_key, json.dumps(params), now, now),
+            )
+            self.db.executemany("INSERT INTO job_images VALUES (?, ?, ?)",
+                                [(job_id, i, raw) for i, raw in enumerate(images)])
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return job_id, True
+
+    def claim(self, owner: str) -> Tuple[str, Dict[str, Any], List[bytes]] | None:
+        """Oldest queued job -> running under `owner`; None if the queue is empty."""
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.db.execute(
+                "SELECT id, params FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                self.db.execute("COMMIT")
+                return None
+            job_id, params = row
+            self.db.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated = ?,"
+                " owner = ? WHERE id = ?", (time.time(), owner, job_id),
+            )
+            images = [r[0] for r in self.db.execute(
+                "SELECT data FROM job_images WHERE job_id = ? ORDER BY idx", (job_id,))]
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return job_id, json.loads(params), images
+
+    def heartbeat(self, job_id: str, owner: str) -> bool:
+        """Extend the lease; False if the job is no longer ours."""
+        return self.db.execute(
+            "UPDATE jobs SET updated = ? WHERE id = ? AND owner = ? AND status = 'running'",
+            (time.time(), job_id, owner),
+        ).rowcount > 0
+
+    def release(self, job_id: str, owner: str) -> None:
+        """Hand a running job back to the queue (clean shutdown)."""
+        self.db.execute(
+            "UPDATE jobs SET status = 'queued', owner = NULL, updated = ?"
+            " WHERE id = ? AND owner = ? AND status = 'running'", (time.time(), job_id, owner),
+        )
+
+    def finish(self, job_id: str, owner: str, result: Any = None,
+               error: str | None = None) -> bool:
+        """Store the outcome; False (nothing written) if the job is no longer ours."""
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            ours = self.db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated = ?"
+                " WHERE id = ? AND owner = ? AND status = 'running'",
+                ("failed" if error else "done", None if error else json.dumps(result),
+                 error, time.time(), job_id, owner),
+            ).rowcount > 0
+            if ours:
+                self.db.execute("DELETE FROM job_images WHERE job_id = ?", (job_id,))
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return ours
+
+    def fetch(self, job_id: str) -> Dict[str, Any] | None:
+        row = self.db.execute(
+            "SELECT status, result, error, attempts, created, updated FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        status, result, error, attempts, created, updated = row
+        job: Dict[str, Any] = {"job_id": job_id, "status": status, "attempts": attempts,
+                               "created": created, "updated": updated}
+        if status == "done":
+            job["result"] = json.loads(result)
+        elif status == "failed":
+            job["error"] = error
+        return job
+
+    def recover(self, max_attempts: int, lease: float) -> Dict[str, int]:
+        """Running jobs whose lease lapsed (owner died): queue again, or fail if retried out."""
+        now = time.time()
+        stale = now - lease
+        self.db.execute("BEGIN IMMEDIATE")
+        failed = self.db.execute(
+            "UPDATE jobs SET status = 'failed', error = 'interrupted', owner = NULL, updated = ?"
+            " WHERE status = 'running' AND updated < ? AND attempts >= ?",
+            (now, stale, max_attempts),
+        ).rowcount
+        requeued = self.db.execute(
+            "UPDATE jobs SET status = 'queued', owner = NULL, updated = ?"
+            " WHERE status = 'running' AND updated < ?", (now, stale),
+        ).rowcount
+        self.db.execute(
+            "DELETE FROM job_images WHERE job_id IN (SELECT id FROM jobs WHERE status = 'failed')"
+        )
+        self.db.execute("COMMIT")
+        return {"requeued": requeued, "failed": failed}
+
+    def purge(self, ttl: float) -> int:
+        self.db.execute("BEGIN IMMEDIATE")
+        n = self.db.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+            (time.time() - ttl,),
+        ).rowcount
+        self.db.execute("COMMIT")
+        return n
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+
+# -------------------------------------------------------------- #
+# 2. QUEUE + WORKERS                                             #
+# -------------------------------------------------------------- #
+class JobQueue:
+    def __init__(self, db_path: str, workers: int, ttl: float, max_attempts: int,
+                 lease: float) -> None:
+        self.db_path      = db_path
+        self.workers      = max(1, workers)
+        self.ttl          = ttl
+        self.max_attempts = max_attempts
+        self.lease        = max(3 * POLL_INTERVAL, lease)
+        self.owner        = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.store: JobStore | None = None
+        self._handler: Handler | None = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._finished: Dict[str, asyncio.Event] = {}
+
+        # counters (this process)
+        self.submitted = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.failed    = 0
+        self.recovered = 0
+
+    # ---------------------------------------------------------- #
+    # lifecycle                                                  #
+    # ---------------------------------------------------------- #
+    async def start(self, handler: Handler) -> None:
+        if self._tasks:
+            return
+        self._handler = handler
+        self.store = self.store or JobStore(self.db_path)
+        recovered = await self.store.call(self.store.recover, self.max_attempts, self.lease)
+        purged = await self.store.call(self.store.purge, self.ttl)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self.recovered += recovered["requeued"]
+        log_event(logging.INFO, "jobs_started", workers=self.workers, db=self.db_path,
+                  owner=self.owner, purged=purged, **recovered)
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    # ---------------------------------------------------------- #
+    # public API                                                 #
+    # ---------------------------------------------------------- #
+    async def submit(self, params: Dict[str, Any], images: List[bytes],
+                     idempotency_key: str | None = None) -> Tuple[str, bool]:
+        job_id, created = await self.store.call(self.store.insert, params, images,
+                                                idempotency_key)
+        if created:
+            self.submitted += 1
+            self._wakeup.set()
+        else:
+            self.deduplicated += 1
+        return job_id, created
+
+    async def get(self, job_id: str) -> Dict[str, Any] | None:
+        return await self.store.call(self.store.fetch, job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Dict[str, Any] | None:
+        """Long-poll: return as soon as the job is finished, or after `timeout`."""
+        deadline = time.monotonic() + max(0.0, timeout)
+        event = self._finished.setdefault(job_id, asyncio.Event())
+        try:
+            while True:
+                job = await self.get(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job["status"] in ("done", "failed") or remaining <= 0:
+                    return job
+                try:
+                    await asyncio.wait_for(event.wait(), min(POLL_INTERVAL, remaining))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if not event.is_set():
+                self._finished.pop(job_id, None)
+
+    # ---------------------------------------------------------- #
+    # workers                                                    #
+    # ---------------------------------------------------------- #
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                if not await self.store.call(self.store.heartbeat, job_id, self.owner):
+                    log_event(logging.WARNING, "job_lease_lost", job_id=job_id)
+                    return
+            except sqlite3.Error as e:                   # busy DB: try again next beat
+                log_event(logging.WARNING, "job_heartbeat_failed", job_id=job_id, error=str(e))
+
+    async def _worker(self, n: int) -> None:
+        last_purge = last_recover = time.monotonic()
+        while True:
+            claimed = await self.store.call(self.store.claim, self.owner)
+            if claimed is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                if n == 0 and time.monotonic() - last_recover > self.lease:
+                    recovered = await self.store.call(self.store.recover, self.max_attempts,
+                                                      self.lease)
+                    last_recover = time.monotonic()
+                    if recovered["requeued"] or recovered["failed"]:
+                        self.recovered += recovered["requeued"]
+                        log_event(logging.INFO, "jobs_recovered", **recovered)
+                if n == 0 and time.monotonic() - last_purge > 3600:
+                    await self.store.call(self.store.purge, self.ttl)
+                    last_purge = time.monotonic()
+                continue
+
+            job_id, params, images = claimed
+            t0 = time.perf_counter()
+            beat = asyncio.create_task(self._heartbeat(job_id))
+            try:
+                result = await self._handler(params, images)
+            except asyncio.CancelledError:
+                await self.store.call(self.store.release, job_id, self.owner)   # shutdown
+                raise
+            except Exception as e:
+                if await self.store.call(self.store.finish, job_id, self.owner, None,
+                                         f"{type(e).__name__}: {e}"):
+                    self.failed += 1
+                log_event(logging.WARNING, "job_failed", job_id=job_id, error=str(e))
+            else:
+                if await self.store.call(self.store.finish, job_id, self.owner, result):
+                    self.completed += 1
+                    log_event(logging.INFO, "job_done", job_id=job_id, images=len(images),
+                              seconds=round(time.perf_counter() - t0, 3))
+                else:
+                    log_event(logging.WARNING, "job_lease_lost", job_id=job_id)
+            finally:
+                beat.cancel()
+            event = self._finished.pop(job_id, None)
+            if event is not None:
+                event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers":      len(self._tasks),
+            "submitted":    self.submitted,
+            "deduplicated": self.deduplicated,
+            "completed":    self.completed,
+            "failed":       self.failed,
+            "recovered":    self.recovered,
+        }
+
+jobs = JobQueue(JOB_DB, JOB_WORKERS, JOB_TTL, JOB_MAX_ATTEMPTS, JOB_LEASE)
@@ -0,0 +1,103 @@
+"""
+SuperMango Structured Logging
+=============================
+log_event(logging.INFO, "prescription", psi=2.0, overall="Mild")
+log_sampled_response(body)
+
+One JSON object per line on stdout:
+  {"ts":"2025-06-01T08:00:00.123Z","level":"INFO","event":"prescription","psi":2.0,...}
+
+Request handlers only enqueue the LogRecord; formatting (json.dumps) and
+the stdout write happen on a background QueueListener thread, so a slow
+terminal or log shipper never blocks the event loop. Fields are only
+collected when the level is enabled.
+
+LOG_LEVEL             DEBUG | INFO (default) | WARNING | …
+LOG_RESPONSE_SAMPLE   fraction of full response bodies to log (default 0.01)
+"""
+import atexit, json, logging, os, queue, random, sys, time
+from logging.handlers import QueueHandler, QueueListener
+from typing           import Any, Callable, Dict
+
+LOG_LEVEL           = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_RESPONSE_SAMPLE = float(os.getenv("LOG_RESPONSE_SAMPLE", 0.01))
+
+log = logging.getLogger("supermango")
+
+# -------------------------------------------------------------- #
+# 1. FORMATTER                                                   #
+# -------------------------------------------------------------- #
+class JsonLineFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        ts = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+        out: Dict[str, Any] = {
+            "ts":    f"{ts}.{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "event": record.getMessage(),
+            "pid":   record.process,
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            out.update(fields() if callable(fields) else fields)
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, separators=(",", ":"), ensure_ascii=False, default=str)
+
+# -------------------------------------------------------------- #
+# 2. QUEUE PIPELINE                                              #
+# -------------------------------------------------------------- #
+_listener: QueueListener | None = None
+
+def setup_logging() -> None:
+    """Idempotent; safe to call from every module that logs."""
+    global _listener
+    if _listener is not None:
+        return
+    q: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonLineFormatter())
+    _listener = QueueListener(q, stream, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    log.handlers[:] = [_PassThroughQueueHandler(q)]
+    log.setLevel(LOG_LEVEL)
+    log.propagate = False
+
+class _PassThroughQueueHandler(QueueHandler):
+    # the stock prepare() formats the message in the caller's thread;
+    # keep the record as-is so json.dumps runs on the listener thread
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+# -------------------------------------------------------------- #
+# 3. HELPERS                                                     #
+# -------------------------------------------------------------- #
+def log_event(level: int, event: str, fields: Callable[[], Dict[str, Any]] | None = None,
+              **kw: Any) -> None:
+    """
+    Emit `event` with keyword fields. Pass `fields=lambda: {...}` for
+    payloads that are expensive to build; it is only called (on the
+    listener thread) if the level is enabled.
+    """
+    if not log.isEnabledFor(level):
+        return
+    payload: Any = kw
+    if fields is not None:
+        payload = (lambda: {**kw, **fields()}) if kw else fields
+    log.log(level, event, extra={"fields": payload})
+
+def log_sampled_response(body: Any) -> None:
+    """Log a full response body for a LOG_RESPONSE_SAMPLE fraction of requests."""
+    if LOG_RESPONSE_SAMPLE > 0 and random.random() < LOG_RESPONSE_SAMPLE:
+        log_event(logging.INFO, "response", body=body)
+
+def _restart_after_fork() -> None:
+    # the listener thread does not survive fork(); give the child its own
+    global _listener
+    _listener = None
+    setup_logging()
+
+setup_logging()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,121 @@
+"""
+SuperMango Prometheus Metrics
+=============================
+timer = StageTimer(); with timer("decode"): ...; timer.observe()
+render() -> (body, content_type)     for GET /metrics
+
+supermango_stage_seconds{stage}               per-request time spent in a stage
+supermango_request_seconds                    whole /getPrescription handler
+supermango_prescriptions_total{overall_label} responses (incl. RETAKE_PHOTO_AGAIN)
+supermango_images_per_request                 upload size distribution
+supermango_requests_in_flight                 requests currently being handled
+supermango_rejections_total{reason}           admission control 429/503 responses
+supermango_<source>_<key>                     numeric fields of registered stats()
+                                              (batcher, verify cache, pre-filter…)
+
+With several server workers set PROMETHEUS_MULTIPROC_DIR so histograms
+and counters are aggregated across processes (registered stats stay
+per-process).
+"""
+import os, time
+from collections import defaultdict
+from contextlib  import contextmanager
+from typing      import Any, Callable, Dict, Iterator, Tuple
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry,
+                               Counter, Gauge, Histogram, generate_latest)
+from prometheus_client.core import GaugeMetricFamily
+
+# -------------------------------------------------------------- #
+# 0. METRICS                                                     #
+# -------------------------------------------------------------- #
+STAGES = ("read", "cache", "decode", "verify", "preprocess", "forward", "recommendation")
+
+_LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+
+STAGE_SECONDS = Histogram(
+    "supermango_stage_seconds", "Per-request time spent in a pipeline stage",
+    ["stage"], buckets=_LATENCY_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "supermango_request_seconds", "Total /getPrescription handling time",
+    buckets=_LATENCY_BUCKETS,
+)
+PRESCRIPTIONS = Counter(
+    "supermango_prescriptions_total", "Responses by overall label", ["overall_label"],
+)
+IMAGES_PER_REQUEST = Histogram(
+    "supermango_images_per_request", "Images uploaded per request",
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50),
+)
+IN_FLIGHT = Gauge(
+    "supermango_requests_in_flight", "Requests currently being handled",
+    multiprocess_mode="livesum",
+)
+REJECTIONS = Counter(
+    "supermango_rejections_total", "Requests turned away by admission control", ["reason"],
+)
+
+# -------------------------------------------------------------- #
+# 1. STAGE TIMER                                                 #
+# -------------------------------------------------------------- #
+class StageTimer:
+    """Accumulates wall time per stage over one request."""
+
+    def __init__(self) -> None:
+        self.totals: Dict[str, float] = defaultdict(float)
+
+    @contextmanager
+    def __call__(self, stage: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[stage] += time.perf_counter() - t0
+
+    def observe(self) -> None:
+        for stage, secs in self.totals.items():
+            STAGE_SECONDS.labels(stage).observe(secs)
+
+    def as_ms(self) -> Dict[str, float]:
+        return {k: round(v * 1000, 2) for k, v in self.totals.items()}
+
+# -------------------------------------------------------------- #
+# 2. STATS SOURCES (existing stats() dicts as gauges)            #
+# -------------------------------------------------------------- #
+_sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+def register_stats(name: str, fn: Callable[[], Dict[str, Any]]) -> None:
+    _sources[name] = fn
+
+def _flatten(prefix: str, d: Dict[str, Any]) -> Iterator[Tuple[str, float]]:
+    for k, v in d.items():
+        key = f"{prefix}_{k}".replace("-", "_")
+        if isinstance(v, bool):
+            yield key, float(v)
+        elif isinstance(v, (int, float)):
+            yield key, float(v)
+        elif isinstance(v, dict):
+            yield from _flatten(key, v)
+
+class _StatsCollector:
+    def collect(self):
+        for name, fn in _sources.items():
+            for key, value in _flatten(f"supermango_{name}", fn()):
+                if not key.replace("_", "").isalnum():
+                    continue
+                yield GaugeMetricFamily(key, f"{name} stats", value=value)
+
+REGISTRY.register(_StatsCollector())
+
+# -------------------------------------------------------------- #
+# 3. EXPOSITION                                                  #
+# -------------------------------------------------------------- #
+def render() -> Tuple[bytes, str]:
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(_StatsCollector())
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
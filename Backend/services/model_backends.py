@@ -0,0 +1,128 @@
+"""
+SuperMango Inference Backends
+=============================
+load_backend(name, load_eager) -> callable: (N, 3, 224, 224) -> (N, 5) logits
+
+MODEL_BACKEND   artifact                               produced by
+-------------   ------------------------------------   ------------------
+eager           models/best_fold_model.pt (fp32)       training
+torchscript     models/best_fold_model.ts.pt           export_models.py
+onnx            models/best_fold_model.onnx            export_models.py
+int8            models/best_fold_model.int8.ts.pt      export_models.py
+                (static PTQ, fbgemm/x86, calibrated)
+int8-dynamic    models/best_fold_model.int8dyn.ts.pt   export_models.py
+                (dynamic: only the Linear head is int8)
+
+`onnx` needs the optional `onnxruntime` package; it is imported only when
+that backend is selected.
+"""
+import inspect, os
+from typing import Callable, Dict, Iterable
+
+import torch
+import torchvision.models.quantization as qmodels
+
+# -------------------------------------------------------------- #
+# 0. CONSTANTS                                                   #
+# -------------------------------------------------------------- #
+BACKENDS = ("eager", "torchscript", "onnx", "int8", "int8-dynamic")
+
+ARTIFACTS: Dict[str, str] = {
+    "torchscript":  "models/best_fold_model.ts.pt",
+    "onnx":         "models/best_fold_model.onnx",
+    "int8":         "models/best_fold_model.int8.ts.pt",
+    "int8-dynamic": "models/best_fold_model.int8dyn.ts.pt",
+}
+
+INPUT_SHAPE = (1, 3, 224, 224)
+
+# -------------------------------------------------------------- #
+# 1. LOADING                                                     #
+# -------------------------------------------------------------- #
+class OnnxModel:
+    """onnxruntime session behind the same call signature as a torch module."""
+
+    def __init__(self, path: str) -> None:
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("MODEL_BACKEND=onnx requires `pip install onnxruntime`") from e
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = torch.get_num_threads()
+        self.session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+        self.input   = self.session.get_inputs()[0].name
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        (out,) = self.session.run(None, {self.input: batch.numpy()})
+        return torch.from_numpy(out)
+
+def load_backend(name: str, load_eager: Callable[[], torch.nn.Module]) -> Callable[[torch.Tensor], torch.Tensor]:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown MODEL_BACKEND {name!r}; choose one of {BACKENDS}")
+    if name == "eager":
+        return load_eager()
+
+    path = ARTIFACTS[name]
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} missing; run `python export_models.py --formats {name}`")
+    if name == "onnx":
+        return OnnxModel(path)
+    if name == "int8":
+        torch.backends.quantized.engine = _quant_engine()
+    m = torch.jit.load(path, map_location="cpu")
+    m.eval()
+    return m
+
+# -------------------------------------------------------------- #
+# 2. EXPORT                                                      #
+# -------------------------------------------------------------- #
+def _quant_engine() -> str:
+    engines = torch.backends.quantized.supported_engines
+    return "x86" if "x86" in engines else "fbgemm" if "fbgemm" in engines else "qnnpack"
+
+def export_torchscript(model: torch.nn.Module, path: str) -> None:
+    with torch.inference_mode():
+        ts = torch.jit.trace(model, torch.zeros(INPUT_SHAPE))
+    torch.jit.save(torch.jit.freeze(ts.eval()), path)
+
+def export_onnx(model: torch.nn.Module, path: str) -> None:
+    torch.onnx.export(
+        model, (torch.zeros(INPUT_SHAPE),), path,
+        input_names=["input"], output_names=["logits"],
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=17, **_legacy_onnx_exporter(),
+    )
+
+def _legacy_onnx_exporter() -> Dict[str, bool]:
+    # newer torch defaults to the dynamo exporter; the TorchScript one needs no extras
+    return {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+
+def export_int8_dynamic(model: torch.nn.Module, path: str) -> None:
+    q = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    with torch.inference_mode():
+        ts = torch.jit.trace(q, torch.zeros(INPUT_SHAPE))
+    torch.jit.save(ts, path)
+
+def export_int8_static(state_dict: Dict[str, torch.Tensor], num_outputs: int,
+                       calibration: Iterable[torch.Tensor], path: str) -> None:
+    """
+    Post-training static quantization of the whole network: conv/bn/relu
+    fusion, observers calibrated on real leaf batches, int8 conversion.
+    """
+    engine = _quant_engine()
+    torch.backends.quantized.engine = engine
+
+    m = qmodels.resnet50(weights=None, quantize=False)
+    m.fc = torch.nn.Linear(m.fc.in_features, num_outputs)
+    m.load_state_dict(state_dict)
+    m.eval()
+    m.fuse_model()
+    m.qconfig = torch.ao.quantization.get_default_qconfig(engine)
+    torch.ao.quantization.prepare(m, inplace=True)
+    with torch.inference_mode():
+        for batch in calibration:
+            m(batch)
+    torch.ao.quantization.convert(m, inplace=True)
+    with torch.inference_mode():
+        ts = torch.jit.trace(m, torch.zeros(INPUT_SHAPE))
+    torch.jit.save(ts, path)
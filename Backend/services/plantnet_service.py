@@ -0,0 +1,154 @@
+"""
+SuperMango Pl@ntNet Leaf Verifier
+=================================
+is_mango_leaf(img_bytes)  -> (True, None) | (False, reason)
+verify_all([img_bytes…])  -> (True, None) | (False, reason of earliest failure)
+
+All calls share one pooled, keep-alive `httpx.AsyncClient`, so verifying a
+whole upload costs roughly one round trip instead of one per image.
+Verdicts are cached by upload hash (see services/cache_service.py), so a
+retaken or re-uploaded photo never hits the API twice. Concurrent lookups
+of the same bytes (a duplicate photo in one upload, or two requests racing)
+share a single in-flight call.
+"""
+import asyncio, os
+from collections import Counter
+from typing      import Any, Dict, List
+
+import httpx
+
+from services.cache_service import VerificationCache, content_key
+
+# -------------------------------------------------------------- #
+# 0. CONSTANTS                                                   #
+# -------------------------------------------------------------- #
+PLANTNET_API_KEY = os.getenv("PLANTNET_API_KEY", "2b10p7W1flrJ7h045oF5cDmzou")
+PLANTNET_URL     = os.getenv("PLANTNET_URL", "https://my-api.plantnet.org/v2/identify/all")
+PLANTNET_TIMEOUT = float(os.getenv("PLANTNET_TIMEOUT", 12))
+PLANTNET_MAX_CONNECTIONS = int(os.getenv("PLANTNET_MAX_CONNECTIONS", 20))
+MANGO_KEYWORDS   = ("mango", "mangifera")
+
+VERIFY_CACHE_SIZE = int(os.getenv("VERIFY_CACHE_SIZE", 4096))
+VERIFY_CACHE_TTL  = float(os.getenv("VERIFY_CACHE_TTL", 7 * 24 * 3600))   # seconds
+VERIFY_CACHE_DB   = os.getenv("VERIFY_CACHE_DB", "")                      # "" = memory only
+
+verify_cache = VerificationCache(VERIFY_CACHE_SIZE, VERIFY_CACHE_TTL, VERIFY_CACHE_DB or None)
+
+# -------------------------------------------------------------- #
+# 1. SHARED HTTP CLIENT                                          #
+# -------------------------------------------------------------- #
+_client: httpx.AsyncClient | None = None
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=PLANTNET_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=PLANTNET_MAX_CONNECTIONS,
+                max_keepalive_connections=PLANTNET_MAX_CONNECTIONS,
+            ),
+        )
+    return _client
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+# -------------------------------------------------------------- #
+# 2. VERIFICATION                                                #
+# -------------------------------------------------------------- #
+def simple_name(sp: Dict[str, Any]) -> str:
+    commons = sp.get("commonNames", [])
+    return commons[0] if commons else sp.get("scientificName", "Unknown").split()[0]
+
+async def is_mango_leaf(img_bytes: bytes) -> tuple[bool, str | None]:
+    """Return (True, None) if mango detected in top-15, else (False, reason)."""
+    files = [
+        ('images', ('upload.jpg', img_bytes, 'image/jpeg')),
+        ('organs', (None, 'leaf')),
+    ]
+    try:
+        r = await get_client().post(PLANTNET_URL, files=files,
+                                    params={'api-key': PLANTNET_API_KEY})
+
+        if r.status_code == 404:
+            return False, "NOT_A_PLANT"
+        r.raise_for_status()
+
+        res = r.json().get("results", [])
+        if not res:
+            return False, "NOT_A_PLANT"
+
+        # look through top-15 predictions
+        for hit in res[:15]:
+            sp = hit.get("species", {})
+            sci = (sp.get("scientificName") or "").lower()
+            com = " ".join(sp.get("commonNames", [])).lower()
+            if any(k in sci or k in com for k in MANGO_KEYWORDS):
+                return True, None
+
+        return False, simple_name(res[0].get("species", {}))
+
+    except httpx.HTTPStatusError as e:
+        return False, f"API_ERROR:{e.response.status_code}"
+    except Exception as e:
+        return False, f"REQUEST_FAILED:{str(e)}"
+
+# single-flight: one Pl@ntNet call per key, shared by every waiter
+_inflight: Dict[str, asyncio.Task] = {}
+_waiters:  Counter = Counter()
+
+async def _lookup(key: str, img_bytes: bytes) -> tuple[bool, str | None]:
+    try:
+        verdict = await is_mango_leaf(img_bytes)
+        await verify_cache.set(key, verdict)
+        return verdict
+    finally:
+        _inflight.pop(key, None)
+
+async def is_mango_leaf_cached(img_bytes: bytes) -> tuple[bool, str | None]:
+    """is_mango_leaf behind the verdict cache; transient errors are not stored."""
+    key = content_key(img_bytes)
+    if key not in _inflight:
+        verdict = await verify_cache.get(key)
+        if verdict is not None:
+            return verdict
+
+    task = _inflight.get(key)
+    if task is None:
+        task = _inflight[key] = asyncio.create_task(_lookup(key, img_bytes))
+    else:
+        verify_cache.coalesced += 1
+
+    _waiters[key] += 1
+    try:
+        return await asyncio.shield(task)
+    finally:
+        _waiters[key] -= 1
+        if _waiters[key] <= 0:
+            del _waiters[key]
+            # the last interested caller went away (e.g. verify_all bailed out)
+            if not task.done():
+                task.cancel()
+
+async def verify_all(batch: List[bytes]) -> tuple[bool, str | None]:
+    """
+    Verify every image concurrently. Returns on the first failure and
+    cancels the calls still in flight, since the answer is already known.
+
+    "First" means first to *complete*, not first in upload order: when
+    several images fail, which reason is reported depends on API timing.
+    """
+    tasks = [asyncio.create_task(is_mango_leaf_cached(b)) for b in batch]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            ok, info = await next_done
+            if not ok:
+                return False, info
+        return True, None
+    finally:
+        for t in tasks:
+            t.cancel()
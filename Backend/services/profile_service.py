@@ -0,0 +1,312 @@
+"""
+SuperMango Request Profiling
+============================
+async with profiler.request("/getPrescription", x_profile, x_admin_token, timer) as prof: ...
+await run_cpu(fn, *args)     # profiled automatically while a request profile is active
+
+Opt-in, per request: a request is profiled when it carries `X-Profile: 1`
+together with a valid `X-Admin-Token`, or at random with the sampling
+rate set through POST /admin/profiling (shared by all server workers
+through a file in PROFILE_DIR). Unprofiled requests pay one contextvar
+lookup per CPU task.
+
+While a profile is active (a contextvar, so concurrent requests never mix):
+  * every run_cpu task of the request (decode, preprocess) runs under its
+    own cProfile in the worker thread/process; the stats are merged. One
+    cProfile runs per process at a time (Python ≥ 3.12 refuses a second),
+    so a task that overlaps another profiled task runs unprofiled and
+    `skipped_tasks` in summary.json counts it
+  * the micro-batch holding its images runs the forward pass under
+    torch.profiler (op table + Chrome trace; the batch may hold other
+    requests' images too, its size is recorded)
+  * log_image adds each decoded image's original size, mode and bytes
+
+At the end PROFILE_DIR/<id>/ gets summary.json (stage timings, images,
+outcome), cprofile.pstats (+ cprofile.txt, top functions) and, if the
+model ran, forward.txt / forward.json (chrome://tracing). The newest
+PROFILE_KEEP profiles are kept.
+
+ADMIN_TOKEN     enables X-Profile and the /admin endpoints ("" = off)
+PROFILE_DIR     artifact directory (default data/profiles)
+PROFILE_KEEP    profiles kept (default 50)
+PROFILE_SAMPLE  initial sampling rate, 0–1 (default 0)
+"""
+import asyncio, contextvars, cProfile, hmac, io, json, logging, os, pstats
+import random, shutil, tempfile, threading, time, uuid
+from contextlib import asynccontextmanager
+from typing     import Any, AsyncIterator, Callable, Dict, List, Tuple
+
+from fastapi import HTTPException
+
+from services.log_service     import log_event
+from services.metrics_service import StageTimer
+
+# -------------------------------------------------------------- #
+# 0. CONFIGURATION                                               #
+# -------------------------------------------------------------- #
+ADMIN_TOKEN    = os.getenv("ADMIN_TOKEN", "")
+PROFILE_DIR    = os.getenv("PROFILE_DIR", os.path.join("data", "profiles"))
+PROFILE_KEEP   = int(os.getenv("PROFILE_KEEP", 50))
+PROFILE_SAMPLE = float(os.getenv("PROFILE_SAMPLE", 0))
+
+ARTIFACTS = {                       # name -> media type
+    "summary.json":    "application/json",
+    "cprofile.pstats": "application/octet-stream",
+    "cprofile.txt":    "text/plain",
+    "forward.txt":     "text/plain",
+    "forward.json":    "application/json",
+}
+TOP_FUNCTIONS  = 40                 # rows in cprofile.txt / forward.txt
+RATE_CHECK_S   = 1.0                # how often the shared sampling rate is re-read
+
+def check_admin(token: str | None) -> None:
+    """403 unless `token` matches ADMIN_TOKEN (and one is configured)."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN)")
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+# -------------------------------------------------------------- #
+# 1. WORKER-SIDE WRAPPERS (module level, picklable)             #
+# -------------------------------------------------------------- #
+_cprofile_lock = threading.Lock()   # one active cProfile per process
+
+def profiled_call(fn: Callable[..., Any], *args: Any) -> Tuple[Any, Dict | None]:
+    """
+    fn(*args) under cProfile; returns (result, raw pstats dict). When a
+    profiler is already active in this process the call runs unprofiled
+    and returns (result, None).
+    """
+    if not _cprofile_lock.acquire(blocking=False):
+        return fn(*args), None
+    try:
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:                 # another tool owns the profiler hook
+            return fn(*args), None
+        try:
+            result = fn(*args)
+        finally:
+            prof.disable()
+        prof.create_stats()
+        return result, prof.stats
+    finally:
+        _cprofile_lock.release()
+
+def traced_call(fn: Callable[..., Any], *args: Any) -> Tuple[Any, Dict[str, str]]:
+    """fn(*args) under torch.profiler; returns (result, {"table", "trace"})."""
+    import torch.profiler as tp
+    with tp.profile(activities=[tp.ProfilerActivity.CPU], record_shapes=True) as prof:
+        result = fn(*args)
+    table = prof.key_averages(group_by_input_shape=True).table(
+        sort_by="self_cpu_time_total", row_limit=TOP_FUNCTIONS)
+    fd, path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        prof.export_chrome_trace(path)
+        with open(path) as f:
+            trace = f.read()
+    finally:
+        os.remove(path)
+    return result, {"table": table, "trace": trace}
+
+# -------------------------------------------------------------- #
+# 2. ONE PROFILED REQUEST                                        #
+# -------------------------------------------------------------- #
+class _RawStats:
+    """What pstats.Stats expects from a profiler: `stats` + create_stats()."""
+    def __init__(self, stats: Dict) -> None:
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+class RequestProfile:
+    def __init__(self, path: str, reason: str) -> None:
+        self.id      = time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        self.path    = path
+        self.reason  = reason                      # "header" | "sampled"
+        self.started = time.time()
+        self.images:  List[Dict[str, Any]] = []
+        self.forward: List[Dict[str, Any]] = []
+        self._stats:  pstats.Stats | None = None
+        self.skipped  = 0                          # run_cpu tasks that ran unprofiled
+
+    def add_stats(self, raw: Dict | None) -> None:
+        if raw is None:
+            self.skipped += 1
+            return
+        holder = _RawStats(raw)                    # stats from another thread/process
+        if self._stats is None:
+            self._stats = pstats.Stats(holder)
+        else:
+            self._stats.add(holder)
+
+    def add_image(self, **info: Any) -> None:
+        self.images.append(info)
+
+    def add_forward(self, report: Dict[str, str], batch_size: int, own: int) -> None:
+        self.forward.append({**report, "batch_size": batch_size, "own_images": own})
+
+    def save(self, directory: str, timings: Dict[str, float], outcome: str) -> Dict[str, Any]:
+        out = os.path.join(directory, self.id)
+        os.makedirs(out, exist_ok=True)
+        summary = {
+            "id":         self.id,
+            "path":       self.path,
+            "reason":     self.reason,
+            "started":    time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.started)),
+            "total_ms":   round((time.time() - self.started) * 1000, 2),
+            "outcome":    outcome,
+            "stages_ms":  timings,
+            "images":     self.images,
+            "skipped_tasks": self.skipped,
+            "forward":    [{k: f[k] for k in ("batch_size", "own_images")} for f in self.forward],
+            "artifacts":  ["summary.json"],
+        }
+        if self._stats is not None:
+            self._stats.dump_stats(os.path.join(out, "cprofile.pstats"))
+            buf = io.StringIO()
+            self._stats.stream = buf
+            self._stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+            with open(os.path.join(out, "cprofile.txt"), "w") as f:
+                f.write(buf.getvalue())
+            summary["artifacts"] += ["cprofile.pstats", "cprofile.txt"]
+        if self.forward:
+            with open(os.path.join(out, "forward.txt"), "w") as f:
+                f.write("\n\n".join(r["table"] for r in self.forward))
+            with open(os.path.join(out, "forward.json"), "w") as f:
+                f.write(self.forward[-1]["trace"])
+            summary["artifacts"] += ["forward.txt", "forward.json"]
+        with open(os.path.join(out, "summary.json"), "w") as f:
+            json.dump(summary, f, indent=1)
+        return summary
+
+current: "contextvars.ContextVar[RequestProfile | None]" = contextvars.ContextVar(
+    "request_profile", default=None)
+
+# -------------------------------------------------------------- #
+# 3. PROFILER (toggle, sampling, storage)                        #
+# -------------------------------------------------------------- #
+class Profiler:
+    def __init__(self, directory: str, keep: int, sample_rate: float) -> None:
+        self.directory  = directory
+        self.keep       = max(1, keep)
+        self._rate      = sample_rate
+        self._rate_file = os.path.join(directory, "sample_rate")
+        self._checked   = 0.0
+        self._mtime     = 0.0
+
+        # counters (this process)
+        self.profiled = 0
+        self.saved    = 0
+
+    # ---- sampling rate, shared through a file ---- #
+    def sample_rate(self) -> float:
+        now = time.monotonic()
+        if now - self._checked >= RATE_CHECK_S:
+            self._checked = now
+            try:
+                mtime = os.stat(self._rate_file).st_mtime
+                if mtime != self._mtime:
+                    with open(self._rate_file) as f:
+                        self._rate, self._mtime = float(f.read()), mtime
+            except (OSError, ValueError):
+                pass
+        return self._rate
+
+    def set_sample_rate(self, rate: float) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self._rate_file + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(repr(rate))
+        os.replace(tmp, self._rate_file)
+        self._rate, self._checked = rate, 0.0
+
+    def _reason(self, x_profile: str | None, admin_token: str | None) -> str | None:
+        if x_profile and x_profile.lower() not in ("0", "false", "off"):
+            check_admin(admin_token)
+            return "header"
+        rate = self.sample_rate()
+        if rate > 0 and random.random() < rate:
+            return "sampled"
+        return None
+
+    # ---- per request ---- #
+    @asynccontextmanager
+    async def request(self, path: str, x_profile: str | None, admin_token: str | None,
+                      timer: StageTimer) -> AsyncIterator[RequestProfile | None]:
+        """Profile the block if asked or sampled; yields the profile or None."""
+        reason = self._reason(x_profile, admin_token)
+        if reason is None:
+            yield None
+            return
+        prof = RequestProfile(path, reason)
+        token = current.set(prof)
+        self.profiled += 1
+        outcome = "ok"
+        try:
+            yield prof
+        except BaseException as e:
+            outcome = f"error: {type(e).__name__}: {getattr(e, 'detail', e)}"
+            if isinstance(e, HTTPException):         # 4xx/5xx still point at their profile
+                e.headers = {**(e.headers or {}), "X-Profile-Id": prof.id}
+            raise
+        finally:
+            current.reset(token)
+            try:
+                await asyncio.to_thread(self._store, prof, timer.as_ms(), outcome)
+            except Exception as e:                   # never fail the request over a profile
+                log_event(logging.WARNING, "profile_save_failed", id=prof.id, error=str(e))
+
+    def _store(self, prof: RequestProfile, timings: Dict[str, float], outcome: str) -> None:
+        summary = prof.save(self.directory, timings, outcome)
+        self.saved += 1
+        log_event(logging.INFO, "profile_saved", id=prof.id, reason=prof.reason,
+                  total_ms=summary["total_ms"])
+        for old in self._ids()[self.keep:]:
+            shutil.rmtree(os.path.join(self.directory, old), ignore_errors=True)
+
+    # ---- listing / download ---- #
+    def _ids(self) -> List[str]:
+        """Profile ids, newest first (ids start with their timestamp)."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted((n for n in names if os.path.isdir(os.path.join(self.directory, n))),
+                      reverse=True)
+
+    def list(self) -> List[Dict[str, Any]]:
+        out = []
+        for pid in self._ids():
+            try:
+                with open(os.path.join(self.directory, pid, "summary.json")) as f:
+                    s = json.load(f)
+            except (OSError, ValueError):
+                continue                             # still being written
+            out.append({k: s[k] for k in ("id", "path", "reason", "started", "total_ms",
+                                          "outcome", "stages_ms", "artifacts")}
+                       | {"images": len(s["images"])})
+        return out
+
+    def artifact(self, profile_id: str, name: str) -> Tuple[str, str]:
+        """(file path, media type); 404 for unknown ids or names."""
+        if name not in ARTIFACTS or profile_id not in self._ids():
+            raise HTTPException(status_code=404, detail="Unknown profile or artifact")
+        path = os.path.join(self.directory, profile_id, name)
+        if not os.path.exists(path):
+            raise HTTPException(status_code=404, detail="Unknown profile or artifact")
+        return path, ARTIFACTS[name]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "header":      bool(ADMIN_TOKEN),
+            "sample_rate": self.sample_rate(),
+            "profiled":    self.profiled,
+            "saved":       self.saved,
+            "keep":        self.keep,
+        }
+
+profiler = Profiler(PROFILE_DIR, PROFILE_KEEP, PROFILE_SAMPLE)
@@ -17,13 +17,23 @@ Returns
   "brands": { … }            # new section at bottom
   "brands_tagalog": { … }    # bagong seksyon sa Tagalog
 }
+
+weather_risk_index(temp[], rh[], wet[]) -> np.ndarray of RISK_LABELS indices
+
+format_recommendation(outcome, lang, compact)      # "both" | "en" | "tl"
+catalog(lang) -> (json_bytes, gzip_bytes, etag)    # versioned text catalog
 """
-from typing import Dict, Tuple
+import gzip, hashlib, json
+from types  import MappingProxyType
+from typing import Dict, Mapping, Tuple
+
+import numpy as np
 
 # -------------------------------------------------------------- #
 # 0. CONSTANTS                                                   #
 # -------------------------------------------------------------- #
 CLASS_LABELS = ["Healthy", "Mild", "Moderate", "Severe"]
+RISK_LABELS  = ["Low", "Medium", "High"]
 
 # -------------------------------------------------------------- #
 # 1. WEATHER-RISK CLASSIFIER                                     #
@@ -40,6 +50,22 @@ def _weather_risk(temp: float, rh: float, wet: float) -> str:
         return "Low"
     return "Medium"
 
+def weather_risk_index(temp, rh, wet) -> np.ndarray:
+    """
+    Vectorized _weather_risk over array-likes of equal (or broadcastable)
+    shape. Returns int8 indices into RISK_LABELS (0 Low, 1 Medium, 2 High),
+    identical to the scalar rules element by element (NaN → Medium, as there).
+    """
+    temp = np.asarray(temp, dtype=np.float64)
+    rh   = np.asarray(rh,   dtype=np.float64)
+    wet  = np.asarray(wet,  dtype=np.float64)
+    saturated = rh >= 95
+    high = saturated & (temp <= 30) & (
+        ((temp >= 25) & (wet >= 12)) | ((temp >= 22) & (wet >= 6))
+    )
+    low  = (temp < 22) | (rh < 85) | (wet < 6)
+    return np.where(high, 2, np.where(low, 0, 1)).astype(np.int8)
+
 # -------------------------------------------------------------- #
 # 2. ENGLISH RULE, ACTION & INFO MATRICES                        #
 # -------------------------------------------------------------- #
@@ -390,7 +416,33 @@ _INFO_MATRIX_TL: Dict[Tuple[str, str], str] = {
 }
 
 # -------------------------------------------------------------- #
-# 4. PUBLIC API                                                  #
+# 4. PRECOMPILED OUTCOMES                                        #
+# -------------------------------------------------------------- #
+# All 4 × 3 severity/risk outcomes are built once at import, as read-only
+# mappings plus their JSON encoding (same separators as FastAPI's
+# JSONResponse), so a request only does a tuple lookup.
+def _build(severity: str, risk: str) -> Mapping[str, str]:
+    key = (severity, risk)
+    return MappingProxyType({
+        # English
+        "severity_label":       severity,
+        "weather_risk":         risk,
+        "action_label":         _ACTION_LABEL_MATRIX[key],
+        "advice":               _RULE_MATRIX[key],
+        "info":                 _INFO_MATRIX[key],
+        # Tagalog
+        "action_label_tagalog": _ACTION_LABEL_MATRIX_TL[key],
+        "advice_tagalog":       _RULE_MATRIX_TL[key],
+        "info_tagalog":         _INFO_MATRIX_TL[key],
+    })
+
+_OUTCOMES: Dict[Tuple[int, str], Mapping[str, str]] = {
+    (sev_idx, risk): _build(sev, risk)
+    for sev_idx, sev in enumerate(CLASS_LABELS) for risk in RISK_LABELS
+}
+
+# -------------------------------------------------------------- #
+# 5. PUBLIC API                                                  #
 # -------------------------------------------------------------- #
 def get_recommendation(
     severity_idx: int,
@@ -401,17 +453,64 @@ def get_recommendation(
     """
     Returns a dict with both English and Tagalog fields.
     """
-    severity = CLASS_LABELS[severity_idx]
-    risk     = _weather_risk(temperature, humidity, wetness)
-    return {
-        # English
-        "severity_label":       severity,
-        "weather_risk":         risk,
-        "action_label":         _ACTION_LABEL_MATRIX[(severity, risk)],
-        "advice":               _RULE_MATRIX[(severity, risk)],
-        "info":                 _INFO_MATRIX[(severity, risk)],
-        # Tagalog
-        "action_label_tagalog": _ACTION_LABEL_MATRIX_TL[(severity, risk)],
-        "advice_tagalog":       _RULE_MATRIX_TL[(severity, risk)],
-        "info_tagalog":         _INFO_MATRIX_TL[(severity, risk)],
-    }
+    risk = _weather_risk(temperature, humidity, wetness)
+    return dict(_OUTCOMES[(severity_idx, risk)])
+
+# -------------------------------------------------------------- #
+# 6. LANGUAGE SELECTION & CATALOG                                #
+# -------------------------------------------------------------- #
+# Compact responses carry only a recommendation id; the phone fetches the
+# texts once from the versioned catalog (GET /recommendations) and caches
+# them by ETag.
+LANGS = ("both", "en", "tl")
+
+_COMMON_FIELDS = ("severity_label", "weather_risk")
+_LANG_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "en":   _COMMON_FIELDS + ("action_label", "advice", "info"),
+    "tl":   _COMMON_FIELDS + ("action_label_tagalog", "advice_tagalog", "info_tagalog"),
+    "both": _COMMON_FIELDS + ("action_label", "advice", "info",
+                              "action_label_tagalog", "advice_tagalog", "info_tagalog"),
+}
+
+def recommendation_id(severity_idx: int, risk: str) -> str:
+    return f"{CLASS_LABELS[severity_idx]}.{risk}".lower()          # e.g. "mild.high"
+
+def _localize(outcome: Mapping[str, str], lang: str) -> Dict[str, str]:
+    return {k: outcome[k] for k in _LANG_FIELDS[lang]}
+
+def _catalog_body(lang: str) -> Dict[str, Dict[str, str]]:
+    return {recommendation_id(sev, risk): _localize(rec, lang)
+            for (sev, risk), rec in _OUTCOMES.items()}
+
+# version changes whenever any text changes
+CATALOG_VERSION = hashlib.sha256(
+    json.dumps(_catalog_body("both"), ensure_ascii=False, sort_keys=True).encode("utf-8")
+).hexdigest()[:12]
+
+def _build_catalog(lang: str) -> Tuple[bytes, bytes, str]:
+    body = json.dumps(
+        {"version": CATALOG_VERSION, "lang": lang, "recommendations": _catalog_body(lang)},
+        ensure_ascii=False, separators=(",", ":"),
+    ).encode("utf-8")
+    return body, gzip.compress(body, compresslevel=9, mtime=0), f'"{CATALOG_VERSION}-{lang}"'
+
+_CATALOGS: Dict[str, Tuple[bytes, bytes, str]] = {lang: _build_catalog(lang) for lang in LANGS}
+
+def catalog(lang: str = "both") -> Tuple[bytes, bytes, str]:
+    """(json bytes, gzip bytes, strong ETag) for one language; built at import."""
+    return _CATALOGS[lang]
+
+def format_recommendation(outcome: Mapping[str, str], severity_idx: int,
+                          lang: str = "both", compact: bool = False) -> Dict[str, str]:
+    """
+    Shape a recommendation for the response: full texts in the requested
+    language(s), or (compact) just the catalog id and version.
+    """
+    if compact:
+        return {
+            "id":              recommendation_id(severity_idx, outcome["weather_risk"]),
+            "catalog_version": CATALOG_VERSION,
+            "severity_label":  outcome["severity_label"],
+            "weather_risk":    outcome["weather_risk"],
+        }
+    return _localize(outcome, lang)
@@ -0,0 +1,164 @@
+"""
+SuperMango Upload Ingestion
+===========================
+check_uploads(files, raw)    -> 400/413/415 before any image work starts
+upload_loader(upload)        -> Loader: re-readable, chunked, size-limited read
+bytes_loader(raw)            -> Loader over bytes already in memory (jobs)
+BodySizeLimit(app)           ASGI middleware: 413 once a body passes its limit
+
+A Loader is `async () -> bytes`. The pipeline reads one file, hashes and
+decodes it to 224×224 and drops the bytes before reading the next, so a
+request holds small decoded images, not its raw photos. Starlette spools
+multipart file parts over 1 MB to temporary files while parsing; the
+middleware aborts that parse as soon as the body is too large (or at once
+from Content-Length), so an oversize upload is never fully received.
+
+MAX_FILE_MB      per photo               (default 15)
+MAX_REQUEST_MB   per multipart request   (default 60)
+MAX_FILES        photos per request      (default 20)
+BULK_MAX_MB      /bulkPrescription body  (default 1024)
+"""
+import os
+from typing import Awaitable, Callable, Dict, List
+
+from fastapi               import HTTPException, UploadFile
+from starlette.types       import ASGIApp, Message, Receive, Scope, Send
+from starlette.responses   import JSONResponse
+
+# -------------------------------------------------------------- #
+# 0. LIMITS                                                      #
+# -------------------------------------------------------------- #
+MAX_FILE_BYTES    = int(float(os.getenv("MAX_FILE_MB", 15)) * 2**20)
+MAX_REQUEST_BYTES = int(float(os.getenv("MAX_REQUEST_MB", 60)) * 2**20)
+MAX_FILES         = int(os.getenv("MAX_FILES", 20))
+BULK_MAX_BYTES    = int(float(os.getenv("BULK_MAX_MB", 1024)) * 2**20)
+
+CHUNK_SIZE = 256 * 1024
+
+# body limit per path; paths not listed get MAX_REQUEST_BYTES
+PATH_LIMITS: Dict[str, int] = {"/bulkPrescription": BULK_MAX_BYTES}
+
+# accepted formats (listed by /capabilities); checked from the first bytes only
+IMAGE_FORMATS    = ("jpeg", "png", "webp")
+IMAGE_SIGNATURES = (                        # + WebP, a RIFF container, in sniff()
+    (b"\xff\xd8\xff",      "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+)
+
+Loader = Callable[[], Awaitable[bytes]]
+
+def sniff(head: bytes) -> str | None:
+    """Image format from magic bytes, or None."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    for sig, fmt in IMAGE_SIGNATURES:
+        if head.startswith(sig):
+            return fmt
+    return None
+
+def _too_large(what: str, limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"{what} exceeds {limit // 2**20} MB")
+
+# -------------------------------------------------------------- #
+# 1. PER-FILE CHECKS AND READS                                   #
+# -------------------------------------------------------------- #
+async def check_uploads(files: List[UploadFile], raw_bytes: int | None = None) -> None:
+    """
+    Reject the request before decoding anything: too many files, a file or
+    the total over its limit (from the parsed part sizes), or a part whose
+    first bytes are not an image. With `raw_bytes` (packed pixel input)
+    every part must be exactly that long instead of an image.
+    """
+    if not files:
+        raise HTTPException(status_code=400, detail="No images uploaded")
+    if len(files) > MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_FILES} images per request")
+    total = 0
+    for upload in files:
+        size = upload.size or 0
+        if size > MAX_FILE_BYTES:
+            raise _too_large(f"{upload.filename}", MAX_FILE_BYTES)
+        total += size
+        if raw_bytes is not None:
+            if size != raw_bytes:
+                raise HTTPException(status_code=400, detail=f"{upload.filename} must be "
+                                    f"exactly {raw_bytes} bytes, got {size}")
+            continue
+        head = await upload.read(16)
+        await upload.seek(0)
+        if sniff(head) is None:
+            raise HTTPException(status_code=415,
+                                detail=f"{upload.filename} is not a JPEG/PNG/WebP image")  # IMAGE_FORMATS
+    if total > MAX_REQUEST_BYTES:
+        raise _too_large("upload", MAX_REQUEST_BYTES)
+
+async def read_upload(upload: UploadFile, limit: int = MAX_FILE_BYTES) -> bytes:
+    """Chunked read from the start of the part; 413 as soon as it passes `limit`."""
+    await upload.seek(0)
+    buf = bytearray()
+    while chunk := await upload.read(CHUNK_SIZE):
+        buf += chunk
+        if len(buf) > limit:
+            raise _too_large(f"{upload.filename}", limit)
+    return bytes(buf)
+
+def upload_loader(upload: UploadFile) -> Loader:
+    """Each call re-reads the part (spooled by Starlette), so bytes need not be kept."""
+    return lambda: read_upload(upload)
+
+def bytes_loader(raw: bytes) -> Loader:
+    async def load() -> bytes:
+        return raw
+    return load
+
+# -------------------------------------------------------------- #
+# 2. REQUEST BODY LIMIT                                          #
+# -------------------------------------------------------------- #
+class BodySizeLimit:
+    """
+    413 when Content-Length is over the limit (nothing is read), or as soon
+    as the bytes received pass it (chunked uploads without a length).
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT"):
+            return await self.app(scope, receive, send)
+
+        limit = PATH_LIMITS.get(scope["path"], MAX_REQUEST_BYTES)
+        headers = dict(scope["headers"])
+        declared = headers.get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            return await self._reject(scope, receive, send, limit)
+
+        seen, started = 0, False
+
+        async def limited_receive() -> Message:
+            nonlocal seen
+            message = await receive()
+            if message["type"] == "http.request":
+                seen += len(message.get("body", b""))
+                if seen > limit:
+                    raise _too_large("request body", limit)
+            return message
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal started
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except HTTPException as e:
+            # raised from receive outside a route's own error handling
+            if e.status_code != 413 or started:
+                raise
+            await self._reject(scope, receive, send, limit)
+
+    @staticmethod
+    async def _reject(scope: Scope, receive: Receive, send: Send, limit: int) -> None:
+        response = JSONResponse({"detail": f"request body exceeds {limit // 2**20} MB"},
+                                status_code=413, headers={"Connection": "close"})
+        await response(scope, receive, send)